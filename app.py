@@ -1,5 +1,8 @@
+import time
+
 import streamlit as st
 from autoresponder import Autoresponder
+from clients import ClientPool
 
 # Page config
 st.set_page_config(
@@ -63,6 +66,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+@st.cache_resource
+def get_client_pool():
+    """One pool for every rerun and session, so connections stay warm"""
+    return ClientPool()
+
+
 # Header
 st.markdown("<h1 class='main-header'>AI Autoresponder</h1>", unsafe_allow_html=True)
 
@@ -93,6 +103,13 @@ with st.sidebar:
         help="Your booking calendar link"
     )
 
+    mode = st.radio(
+        "Pipeline",
+        options=["two_stage", "fused"],
+        format_func=lambda m: "Classify, then respond" if m == "two_stage" else "Single call",
+        help="Compare latency and quality of the two-call and single-call pipelines"
+    )
+
     st.markdown("---")
 
     # How it works - simple
@@ -209,16 +226,40 @@ if st.button("Generate Response", type="primary", use_container_width=True):
     elif not user_reply:
         st.warning("Please enter a reply to test")
     else:
-        with st.spinner("Analyzing and generating response..."):
-            try:
-                responder = Autoresponder(api_key=api_key, calendar_link=calendar_link)
-                result = responder.process(user_reply)
-
-                # Store result in session
-                st.session_state.last_result = result
-
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
+        try:
+            pool = get_client_pool()
+            warm = pool.is_warm(api_key)
+            responder = Autoresponder(api_key=api_key, calendar_link=calendar_link, mode=mode, pool=pool)
+
+            if mode == "fused":
+                with st.spinner("Analyzing and generating response..."):
+                    started = time.perf_counter()
+                    result = responder.process(user_reply)
+                    result["latency"] = time.perf_counter() - started
+            else:
+                # Stream the reply so reviewers see text as soon as the first token lands
+                status = st.empty()
+                live = st.empty()
+                status.markdown("_Analyzing reply..._")
+                text = ""
+                for event in responder.process_stream(user_reply):
+                    if event["type"] == "classification":
+                        status.markdown(f"_Classified as {event['category']}, writing response..._")
+                    elif event["type"] == "delta":
+                        text += event["text"]
+                        live.markdown(f"<div class='response-box'>{text}</div>", unsafe_allow_html=True)
+                    else:
+                        result = {k: v for k, v in event.items() if k != "type"}
+                status.empty()
+                live.empty()
+
+            result["warm"] = warm
+
+            # Store result in session
+            st.session_state.last_result = result
+
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
 
 # Display result
 if "last_result" in st.session_state:
@@ -250,6 +291,10 @@ if "last_result" in st.session_state:
     # Generated response
     st.markdown("**Generated Response:**")
     st.markdown(f"<div class='response-box'>{result['response']}</div>", unsafe_allow_html=True)
+    if "latency" in result:
+        connection = "warm" if result.get("warm") else "cold"
+        first_token = f", first token after {result['ttft']:.2f}s" if "ttft" in result else ""
+        st.caption(f"Generated in {result['latency']:.2f}s{first_token} ({connection} connection)")
 
 # CTA Section
 st.markdown("---")
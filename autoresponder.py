@@ -1,128 +1,1194 @@
 """
 Autoresponder logic - classification and response generation
 """
+import contextvars
 import json
-from openai import OpenAI
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from deadline import DEADLINE, DeadlineExceeded, remaining
+from fastpath import normalize
+from metrics import NULL_SPAN
 from prompts import (
-    CONTEXT,
     CLASSIFIER_PROMPT,
-    STRONG_POSITIVE_PROMPT,
-    STRONG_POSITIVE_EXAMPLES,
-    SOFT_POSITIVE_PROMPT,
-    SOFT_POSITIVE_EXAMPLES,
-    NEUTRAL_PROMPT,
-    NEUTRAL_EXAMPLES,
-    SOFT_OBJECTION_PROMPT,
-    SOFT_OBJECTION_EXAMPLES,
+    CLASSIFIER_CODES,
+    CLASSIFIER_CODE_OUTPUT,
+    CLASSIFIER_STRUCTURED_OUTPUT,
+    FALLBACK_TEMPLATES,
     HARD_NO_RESPONSE,
+    REPLY_REWRITE,
+    THREAD_CONTEXT,
 )
+from registry import DEFAULT_TENANT, FUSED, PromptRegistry, Tenant
+from singleflight import AsyncSingleFlight, SingleFlight
+from threads import ThreadStore
+
+# openai and asyncio are imported where first used: together they are most of a cold start (see coldstart.py)
+
+MODES = ("two_stage", "fused")
+
+# openai: the official SDK; urllib: lite_client, which skips the SDK import on cold starts
+TRANSPORTS = ("openai", "urllib")
+
+# json: free-form JSON (original prompt); structured: schema-constrained JSON;
+# code: a letter and a flag, with confidence taken from token logprobs
+CLASSIFIER_MODES = ("json", "structured", "code")
+
+CLASSIFICATION_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "classification",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "category": {"type": "string", "enum": list(CLASSIFIER_CODES.values())},
+                "confidence": {"type": "string", "enum": ["high", "medium", "low"]},
+                "manual_required": {"type": "boolean"},
+            },
+            "required": ["category", "confidence", "manual_required"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Classifier rules without the inline reply, so the reply can go in its own message
+CLASSIFIER_RULES = CLASSIFIER_PROMPT.split("Here is the lead's reply:")[0].strip()
+
+FALLBACK_CLASSIFICATION = {
+    "category": "NEUTRAL",
+    "confidence": "low",
+    "manual_required": True
+}
 
 
 class Autoresponder:
-    def __init__(self, api_key: str, calendar_link: str = "https://cal.com/your-calendar"):
-        self.client = OpenAI(api_key=api_key)
-        self.calendar_link = calendar_link
-        self.model = "gpt-4o"
+    def __init__(
+        self,
+        api_key: str,
+        calendar_link: str = "https://cal.com/your-calendar",
+        mode: str = "two_stage",
+        classifier_mode: str = "json",
+        fast_path=None,
+        vector_index=None,
+        cache=None,
+        registry: PromptRegistry = None,
+        tenant: str = DEFAULT_TENANT,
+        model: str = "gpt-4o",
+        classify_model: str = None,
+        response_models: dict = None,
+        client=None,
+        pool=None,
+        base_url: str = None,
+        scheduler=None,
+        metrics=None,
+        coalesce: bool = False,
+        share_generation: bool = False,
+        speculator=None,
+        threads: ThreadStore = None,
+        preprocessor=None,
+        deadline: float = None,
+        hedger=None,
+        templates: dict = None,
+        reply_pool=None,
+        transport: str = "openai",
+        cassette=None,
+        validator=None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        if classifier_mode not in CLASSIFIER_MODES:
+            raise ValueError(f"Unknown classifier_mode {classifier_mode!r}, expected one of {CLASSIFIER_MODES}")
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport {transport!r}, expected one of {TRANSPORTS}")
+        if registry is None:
+            registry = PromptRegistry([Tenant(tenant, calendar_link=calendar_link)])
+        # The client is built on first use, so replies that never reach the model skip the SDK import
+        self.transport = transport
+        self.cassette = cassette
+        self._client = client if cassette is None or client is None else self._make_cassette_client(lambda: client)
+        self._client_args = (api_key, base_url, pool)
+        self._client_lock = threading.Lock()
+        self.registry = registry
+        self.tenant = tenant
+        self.calendar_link = registry.tenant(tenant).calendar_link
+        self.model = model
+        self.classify_model = classify_model
+        self.response_models = response_models or {}
+        self.mode = mode
+        self.classifier_mode = classifier_mode
+        self.fast_path = fast_path
+        self.vector_index = vector_index
+        self.cache = cache
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.flights = self._make_flights() if coalesce else None
+        self.share_generation = share_generation
+        self.speculator = speculator
+        self.speculation_pool = self._make_speculation_pool() if speculator is not None else None
+        self.threads = threads if threads is not None else ThreadStore()
+        self.preprocessor = preprocessor
+        self.deadline = deadline
+        self.hedger = hedger
+        self.call_pool = self._make_call_pool()
+        self.reply_pool = reply_pool
+        self.validator = validator
+        self.templates = {
+            category: template.format(calendar_link=self.calendar_link)
+            for category, template in {**FALLBACK_TEMPLATES, **(templates or {})}.items()
+        }
+        if metrics is not None:
+            components = (("fast_path", fast_path), ("vector_index", vector_index), ("cache", cache),
+                          ("scheduler", scheduler), ("coalesce", self.flights), ("speculation", speculator),
+                          ("threads", threads), ("preprocess", preprocessor),
+                          ("hedging", hedger), ("reply_pool", reply_pool), ("cassette", cassette),
+                          ("output_rules", validator))
+            for name, component in components:
+                if component is not None:
+                    metrics.add_source(name, component.stats)
 
-    def classify(self, message: str) -> dict:
-        """Classify the incoming message into a category"""
-        prompt = CLASSIFIER_PROMPT.format(message=message)
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None and self.cassette is None:
+                    self._client = self._make_client(*self._client_args)
+                elif self._client is None:
+                    # Replays never build the real client, so they skip the SDK import too
+                    self._client = self._make_cassette_client(lambda: self._make_client(*self._client_args))
+        return self._client
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
+    @client.setter
+    def client(self, client):
+        self._client = client
 
-        content = response.choices[0].message.content.strip()
+    def _make_client(self, api_key: str, base_url: str = None, pool=None):
+        if self.transport == "urllib":
+            from lite_client import LiteClient
+            return LiteClient(api_key=api_key, base_url=base_url)
+        if pool is not None:
+            return pool.get(api_key, base_url)
+        from openai import OpenAI
+        return OpenAI(api_key=api_key, base_url=base_url)
 
-        # Parse JSON from response
-        try:
-            # Handle markdown code blocks
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
+    def _make_cassette_client(self, factory):
+        return self.cassette.client(factory)
+
+    def _make_flights(self):
+        return SingleFlight()
+
+    def _make_speculation_pool(self):
+        return ThreadPoolExecutor(thread_name_prefix="speculate")
+
+    def _make_call_pool(self):
+        # Calls under a deadline or hedge run here so the caller can stop waiting on them
+        return ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-call")
+
+    def _flight_key(self, kind: str, message: str, *parts) -> tuple:
+        """Identical in-flight work: same normalized message under the same tenant config"""
+        return (kind, normalize(message), self.model, self._tenant_fingerprint(), *parts)
+
+    def _span(self, stage: str):
+        """Timing span for a stage; a shared no-op when metrics are off"""
+        if self.metrics is None:
+            return NULL_SPAN
+        return self.metrics.span(stage)
+
+    def _prepare(self, message: str) -> tuple:
+        """Incoming text reduced to the new reply, plus its Stripped report if a preprocessor ran"""
+        if self.preprocessor is None:
+            return message, None
+        with self._span("preprocess"):
+            stripped = self.preprocessor(message)
+        return stripped.text, stripped
+
+    @staticmethod
+    def _report(result: dict, stripped) -> dict:
+        if stripped is not None:
+            result["tokens_saved"] = stripped.saved
+        return result
+
+    def _count(self, name: str, **labels):
+        if self.metrics is not None:
+            self.metrics.increment(name, **labels)
+
+    def _tag(self, result: dict, tier: str) -> dict:
+        """Record which tier answered a classification"""
+        result["tier"] = tier
+        if self.metrics is not None:
+            self.metrics.increment(
+                "classifications",
+                category=result.get("category", "NEUTRAL"),
+                confidence=result.get("confidence", "medium"),
+                tier=tier,
+            )
+            if result.get("manual_required"):
+                self.metrics.increment("manual_required")
+        return result
+
+    def _record_usage(self, stage: str, response):
+        if self.metrics is not None and not self._is_stream(response):
+            self.metrics.record_usage(stage, getattr(response, "usage", None))
+
+    @staticmethod
+    def _is_stream(response) -> bool:
+        return not hasattr(response, "choices")
+
+    def _call(self, model: str, **kwargs):
+        if self.scheduler is not None:
+            return self.scheduler.call(self.client, model=model, **kwargs)
+        return self.client.chat.completions.create(model=model, **kwargs)
+
+    def _complete(self, stage: str, model: str = None, **kwargs):
+        """Run a single chat completion, on the configured model unless overridden"""
+        model = model or self.model
+        with self._span(f"llm_{stage}"):
+            left = self._budget(stage, kwargs)
+            if left is None and (self.hedger is None or kwargs.get("stream")):
+                response = self._call(model, **kwargs)
+            else:
+                response = self._race(stage, left, model, kwargs)
+        self._record_usage(stage, response)
+        return response
+
+    def _budget(self, stage: str, kwargs: dict):
+        """Seconds left for a call under the current deadline; raises if it can't finish in time"""
+        left = remaining()
+        if left is None:
+            return None
+        typical = self.hedger.quantile(stage, 50) if self.hedger is not None else None
+        if left <= 0 or (typical is not None and left < typical):
+            raise DeadlineExceeded(f"{stage} needs about {typical or 0:.2f}s, {max(left, 0):.2f}s left")
+        kwargs["timeout"] = left
+        return left
+
+    def _hedge_delay(self, stage: str, kwargs: dict):
+        if self.hedger is None or kwargs.get("stream"):
+            return None
+        return self.hedger.delay(stage)
+
+    def _settle_race(self, stage: str, hedge, future, seconds: float):
+        """Record how long the first attempt took, or had run when the hedge beat it
+
+        Timing whichever call won would only ever add the faster of two
+        attempts, pulling the hedge threshold down until every call is hedged.
+        """
+        if self.hedger is not None:
+            self.hedger.record(stage, seconds)
+            if future is hedge:
+                self.hedger.won()
+                self._count("hedge_wins", stage=stage)
+
+    def _race(self, stage: str, left, model: str, kwargs: dict):
+        """First answer from the call or, once it runs past the hedge delay, a duplicate of it"""
+        def attempt():
+            return self._call(model, **kwargs)
+
+        now = started = time.monotonic()
+        end = None if left is None else now + left
+        delay = self._hedge_delay(stage, kwargs)
+        hedge_at = None if delay is None or (end is not None and now + delay >= end) else now + delay
+        pending, hedge, error = {self.call_pool.submit(attempt)}, None, None
+
+        while pending:
+            wake = min((t for t in (end, hedge_at) if t is not None), default=None)
+            timeout = None if wake is None else max(0.0, wake - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self._settle_race(stage, hedge, future, time.monotonic() - started)
+                return response
+            now = time.monotonic()
+            if pending and hedge_at is not None and now >= hedge_at:
+                hedge, hedge_at = self.call_pool.submit(attempt), None
+                pending.add(hedge)
+                self.hedger.hedged()
+                self._count("hedges", stage=stage)
+            elif pending and end is not None and now >= end:
+                if self.hedger is not None:
+                    self.hedger.record(stage, now - started)
+                # Calls still running are abandoned; their own timeout ends them
+                raise DeadlineExceeded(f"{stage} ran past the deadline")
+        raise error
+
+    def _classifier_messages(self, message: str) -> list:
+        """Build the classification request"""
+        if self.classifier_mode == "json":
+            prompt = CLASSIFIER_PROMPT.format(message=message)
+            return [{"role": "user", "content": prompt}]
+
+        output = CLASSIFIER_CODE_OUTPUT if self.classifier_mode == "code" else CLASSIFIER_STRUCTURED_OUTPUT
+        return [
+            {"role": "system", "content": f"{CLASSIFIER_RULES}\n\n{output}"},
+            {"role": "user", "content": message},
+        ]
+
+    def _classifier_request(self, message: str) -> dict:
+        """Completion arguments for the configured classifier mode"""
+        request = {"messages": self._classifier_messages(message)}
+        if self.classifier_mode == "json":
+            request["temperature"] = 0.3
+        elif self.classifier_mode == "structured":
+            request.update(temperature=0, max_tokens=40, response_format=CLASSIFICATION_SCHEMA)
+        else:
+            request.update(temperature=0, max_tokens=3, logprobs=True)
+        return request
+
+    def _parse_classifier_response(self, response) -> dict:
+        choice = response.choices[0]
+        if self.classifier_mode == "code":
+            return self._parse_code(choice.message.content, getattr(choice, "logprobs", None))
+        return self._parse_classification(choice.message.content)
+
+    def _parse_code(self, content: str, logprobs=None) -> dict:
+        """Parse 'A 0' style output; confidence comes from the category token's probability"""
+        with self._span("parse"):
+            parts = (content or "").split()
+            category = CLASSIFIER_CODES.get(parts[0].upper()) if parts else None
+            if category is None:
+                self._count("fallback", reason="parse_error")
+                return dict(FALLBACK_CLASSIFICATION)
+
+            confidence = "medium"
+            tokens = getattr(logprobs, "content", None) or []
+            for token in tokens:
+                if token.token.strip().upper() in CLASSIFIER_CODES:
+                    probability = math.exp(token.logprob)
+                    confidence = "high" if probability >= 0.9 else "medium" if probability >= 0.6 else "low"
+                    break
 
-            result = json.loads(content)
-            return result
-        except json.JSONDecodeError:
             return {
-                "category": "NEUTRAL",
-                "confidence": "low",
-                "manual_required": True
+                "category": category,
+                "confidence": confidence,
+                "manual_required": len(parts) > 1 and parts[1] == "1",
             }
 
-    def _build_messages(self, system_prompt: str, examples: list, message: str) -> list:
-        """Build messages list with few-shot examples"""
-        messages = [{"role": "system", "content": system_prompt}]
+    def _parse_classification(self, content: str) -> dict:
+        """Parse the classifier output, falling back to manual review"""
+        content = (content or "").strip()
 
-        for ex in examples:
-            role = ex["role"]
-            content = ex["content"].format(calendar_link=self.calendar_link)
-            messages.append({"role": role, "content": content})
+        # Parse JSON from response
+        with self._span("parse"):
+            try:
+                # Handle markdown code blocks
+                if "```json" in content:
+                    content = content.split("```json")[1].split("```")[0]
+                elif "```" in content:
+                    content = content.split("```")[1].split("```")[0]
 
-        messages.append({"role": "user", "content": message})
-        return messages
+                result = json.loads(content)
+                return result
+            except json.JSONDecodeError:
+                self._count("fallback", reason="parse_error")
+                return dict(FALLBACK_CLASSIFICATION)
 
-    def generate_response(self, message: str, category: str) -> str:
-        """Generate a response based on the category"""
+    def _local_classification(self, message: str):
+        """Answer from local classifiers when they are confident, else None"""
+        for source, classifier in (("fast_path", self.fast_path), ("vector_index", self.vector_index)):
+            if classifier is None:
+                continue
+            result = classifier.classify(message)
+            if result is not None:
+                return self._tag(result, source)
+        return None
+
+    def _cache_key(self, kind: str, message: str, *parts):
+        """Cache key for this responder's settings, or None without a cache"""
+        if self.cache is None:
+            return None
+        return self.cache.key(kind, message, self.model, *parts)
+
+    def _tenant_fingerprint(self) -> str:
+        return self.registry.fingerprint(self.tenant)
 
+    def _cache_get(self, key, variants: int = 1):
+        if key is None:
+            return None
+        return self.cache.get(key, variants)
+
+    def _cache_put(self, key, value, variants: int = 1):
+        # Parse failures go to manual review; retrying them beats caching them
+        if key is not None and not self._is_fallback(value):
+            self.cache.put(key, value, variants)
+
+    @staticmethod
+    def _is_fallback(value) -> bool:
+        """Whether a classification is the parse-failure fallback, whichever tier it was tagged with"""
+        return isinstance(value, dict) and {k: v for k, v in value.items() if k != "tier"} == FALLBACK_CLASSIFICATION
+
+    def _needs_escalation(self, result: dict) -> bool:
+        """Whether a cheap-tier classification should be redone on the strong model"""
+        return (
+            result.get("confidence") == "low"
+            or bool(result.get("manual_required"))
+            or result.get("category") not in CLASSIFIER_CODES.values()
+        )
+
+    def _classify_llm(self, message: str) -> dict:
+        """Classify on the cheap model, escalating to the strong one when unsure"""
+        if self.classify_model is not None:
+            response = self._complete("classify_cheap", model=self.classify_model, **self._classifier_request(message))
+            result = self._parse_classifier_response(response)
+            if not self._needs_escalation(result):
+                result["tier"] = "cheap"
+                return result
+            self._count("escalations")
+
+        response = self._complete("classify", **self._classifier_request(message))
+        result = self._parse_classifier_response(response)
+        result["tier"] = "strong"
+        return result
+
+    def _classify_fast(self, message: str):
+        """Local or cached classification, or None when the model has to answer"""
+        local = self._local_classification(message)
+        if local is not None:
+            return local
+        cached = self._cache_get(self._cache_key("classify", message, self.classifier_mode, self.classify_model))
+        if cached is not None:
+            return self._tag(dict(cached), "cache")
+        return None
+
+    def _classify_model(self, message: str) -> dict:
+        if self.flights is None:
+            result = self._classify_llm(message)
+        else:
+            flight = self._flight_key("classify", message, self.classifier_mode, self.classify_model)
+            result = dict(self.flights.do(flight, lambda: self._classify_llm(message)))
+        self._cache_put(self._cache_key("classify", message, self.classifier_mode, self.classify_model), result)
+        return self._tag(result, result.get("tier", "strong"))
+
+    def classify(self, message: str) -> dict:
+        """Classify the incoming message into a category"""
+        with self._span("classify"):
+            result = self._classify_fast(message)
+            if result is None:
+                result = self._classify_model(message)
+            return result
+
+    def _fixed_response(self, category: str) -> str:
+        """Reply used for categories that never reach the model"""
         if category == "HARD_NO":
             return HARD_NO_RESPONSE
+        return "I'll get back to you shortly."
 
-        if category == "STRONG_POSITIVE":
-            system_prompt = STRONG_POSITIVE_PROMPT.format(
-                context=CONTEXT,
-                calendar_link=self.calendar_link,
-                message="{message}"
-            )
-            examples = STRONG_POSITIVE_EXAMPLES
+    def _pooled(self, message: str, classification: dict, recipient: str = None):
+        """Pregenerated reply for a generic message, or None"""
+        if self.reply_pool is None or not self.reply_pool.serves(message, classification):
+            return None
+        return self.reply_pool.take(self.tenant, self._tenant_fingerprint(), classification["category"], recipient)
 
-        elif category == "SOFT_POSITIVE":
-            system_prompt = SOFT_POSITIVE_PROMPT.format(
-                context=CONTEXT,
-                message="{message}"
-            )
-            examples = SOFT_POSITIVE_EXAMPLES
+    def _response_model(self, category: str) -> str:
+        """Generation model for a category; defaults to the strong model"""
+        return self.response_models.get(category, self.model)
 
-        elif category == "NEUTRAL":
-            system_prompt = NEUTRAL_PROMPT.format(
-                context=CONTEXT,
-                message="{message}"
-            )
-            examples = NEUTRAL_EXAMPLES
+    def _response_messages(self, message: str, category: str):
+        """Build the generation request, or None if the category has a fixed reply"""
+        return self.registry.messages(self.tenant, category, message)
 
-        elif category == "SOFT_OBJECTION":
-            system_prompt = SOFT_OBJECTION_PROMPT.format(
-                context=CONTEXT,
-                message="{message}"
-            )
-            examples = SOFT_OBJECTION_EXAMPLES
+    def generate_response(self, message: str, category: str) -> str:
+        """Generate a response based on the category"""
+        messages = self._response_messages(message, category)
+        if messages is None:
+            return self._fixed_response(category)
+
+        key = self._cache_key("generate", message, category, self.calendar_link, self._tenant_fingerprint(),
+                              self._response_model(category))
+        variants = self.cache.variants if key else 1
+        cached = self._cache_get(key, variants)
+        if cached is not None:
+            return cached
+
+        if self.flights is not None and self.share_generation:
+            flight = self._flight_key("generate", message, category)
+            reply = self.flights.do(flight, lambda: self._generate_llm(messages, category))
         else:
-            return "I'll get back to you shortly."
+            reply = self._generate_llm(messages, category)
+        self._cache_put(key, reply, variants)
+        return reply
 
-        messages = self._build_messages(system_prompt, examples, message)
+    def _generate_llm(self, messages: list, category: str) -> str:
+        reply = self._draft(messages, category)
+        violations = self._review(category, reply)
+        return self._repair(messages, category, reply, violations) if violations else reply
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+    def _draft(self, messages: list, category: str) -> str:
+        response = self._complete(
+            "generate",
+            model=self._response_model(category),
             messages=messages,
             temperature=0.7,
             max_tokens=150,
         )
-
         return response.choices[0].message.content.strip()
 
-    def process(self, message: str) -> dict:
-        """Full pipeline: classify and generate response"""
+    def _review(self, category: str, reply: str) -> list:
+        """Rule violations in a first draft, counted per category; none when validation is off"""
+        if self.validator is None:
+            return []
+        with self._span("validate"):
+            violations = self.validator.review(category, reply, self.calendar_link)
+        for violation in violations:
+            self._count("rule_violations", category=category, rule=violation.rule)
+        return violations
+
+    def _check(self, category: str, reply: str) -> list:
+        with self._span("validate"):
+            return self.validator.check(category, reply, self.calendar_link)
+
+    @staticmethod
+    def _rewrite_messages(messages: list, reply: str, violations: list) -> list:
+        """The generation request followed by the broken reply and what it broke"""
+        rules = "\n".join(f"- {violation.detail}" for violation in violations)
+        return messages + [{"role": "assistant", "content": reply},
+                           {"role": "user", "content": REPLY_REWRITE.format(violations=rules)}]
+
+    def _repair(self, messages: list, category: str, reply: str, violations: list) -> str:
+        """Regenerate a reply that broke a rule while the validator's budget allows; keeps the cleanest draft"""
+        attempts = 0
+        while violations and self.validator.allow_retry(attempts):
+            attempts += 1
+            self._count("regenerations", category=category)
+            candidate = self._draft(self._rewrite_messages(messages, reply, violations), category)
+            found = self._check(category, candidate)
+            if len(found) < len(violations):
+                reply, violations = candidate, found
+        self.validator.settle(violations)
+        return reply
+
+    def generate_response_stream(self, message: str, category: str):
+        """Generate a response based on the category, yielding text chunks as they arrive"""
+        messages = self._response_messages(message, category)
+        if messages is None:
+            yield self._fixed_response(category)
+            return
+
+        key = self._cache_key("generate", message, category, self.calendar_link, self._tenant_fingerprint(),
+                              self._response_model(category))
+        variants = self.cache.variants if key else 1
+        cached = self._cache_get(key, variants)
+        if cached is not None:
+            yield cached
+            return
+
+        stream = self._complete(
+            "generate",
+            model=self._response_model(category),
+            messages=messages,
+            temperature=0.7,
+            max_tokens=150,
+            stream=True,
+        )
+        parts = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+
+        # Streamed text is already out, so a broken reply is only counted
+        reply = "".join(parts).strip()
+        self._review(category, reply)
+        self._cache_put(key, reply, variants)
+
+    def _classification_event(self, classification: dict) -> dict:
+        event = {"type": "classification", **self._result(classification, "")}
+        del event["response"]
+        return event
+
+    def _done_event(self, started: float, first_token: float, classification: dict, parts: list) -> dict:
+        finished = time.perf_counter()
+        return {
+            "type": "done",
+            **self._result(classification, "".join(parts).strip()),
+            "ttft": (first_token or finished) - started,
+            "latency": finished - started,
+        }
+
+    def process_stream(self, message: str):
+        """Full pipeline as events: classification first, then reply deltas, then done
+
+        The done event carries the final result plus `ttft` (seconds until the
+        first reply chunk) and `latency` (seconds until the reply was complete).
+        """
+        started = time.perf_counter()
+        message, stripped = self._prepare(message)
         classification = self.classify(message)
-        category = classification.get("category", "NEUTRAL")
+        yield self._classification_event(classification)
+
+        first_token = None
+        parts = []
+        for text in self.generate_response_stream(message, classification.get("category", "NEUTRAL")):
+            if first_token is None:
+                first_token = time.perf_counter()
+            parts.append(text)
+            yield {"type": "delta", "text": text}
 
-        response = self.generate_response(message, category)
+        yield self._report(self._done_event(started, first_token, classification, parts), stripped)
 
+    def _result(self, classification: dict, response: str) -> dict:
+        """Shape the pipeline output"""
         return {
-            "category": category,
+            "category": classification.get("category", "NEUTRAL"),
             "confidence": classification.get("confidence", "medium"),
             "manual_required": classification.get("manual_required", False),
-            "response": response
+            "response": response,
+            "tier": classification.get("tier"),
         }
+
+    def _fused_messages(self, message: str) -> list:
+        """Build a single request that both classifies and replies"""
+        return self.registry.messages(self.tenant, FUSED, message)
+
+    def _fused_result(self, content: str) -> tuple:
+        """Split fused output into the classification and the reply, if any"""
+        result = self._parse_classification(content)
+        category = result.get("category", "NEUTRAL")
+        if category == "HARD_NO":
+            return result, HARD_NO_RESPONSE
+        return result, (result.get("response") or "").strip()
+
+    def process_fused(self, message: str, recipient: str = None) -> dict:
+        """Classify and generate response in a single completion"""
+        local = self._local_classification(message)
+        if local is not None:
+            try:
+                response = self._pooled(message, local, recipient)
+                if response is None:
+                    response = self.generate_response(message, local["category"])
+                return self._result(local, response)
+            except DeadlineExceeded as e:
+                e.classification = local
+                raise
+
+        response = self._complete(
+            "fused",
+            messages=self._fused_messages(message),
+            temperature=0.7,
+            max_tokens=300,
+            response_format={"type": "json_object"},
+        )
+        classification, reply = self._fused_result(response.choices[0].message.content)
+        self._tag(classification, "fused")
+        category = classification.get("category", "NEUTRAL")
+        try:
+            if not reply:
+                # Unparseable output: fall back to the dedicated generation prompt
+                reply = self.generate_response(message, category)
+            elif violations := self._review(category, reply):
+                reply = self._repair(self._response_messages(message, category), category, reply, violations)
+        except DeadlineExceeded as e:
+            e.classification = classification
+            raise
+        return self._result(classification, reply)
+
+    def process(self, message: str, deadline: float = None, recipient: str = None) -> dict:
+        """Full pipeline: classify and generate response
+
+        deadline is a latency budget in seconds (default: the responder's). When
+        the model can't answer inside it, a template reply flagged for manual
+        review is returned instead. recipient keeps pooled replies from
+        repeating for the same lead.
+        """
+        with self._span("pipeline"):
+            message, stripped = self._prepare(message)
+            token = self._start_deadline(deadline)
+            classification = None
+            try:
+                if self.mode == "fused":
+                    result = self.process_fused(message, recipient)
+                elif self.speculator is not None:
+                    result = self.process_speculative(message, recipient)
+                else:
+                    classification = self.classify(message)
+                    category = classification.get("category", "NEUTRAL")
+
+                    response = self._pooled(message, classification, recipient)
+                    if response is None:
+                        response = self.generate_response(message, category)
+
+                    result = self._result(classification, response)
+            except DeadlineExceeded as e:
+                result = self._deadline_result(classification or e.classification)
+            finally:
+                DEADLINE.reset(token)
+            return self._report(result, stripped)
+
+    def _start_deadline(self, deadline: float = None):
+        budget = self.deadline if deadline is None else deadline
+        return DEADLINE.set(None if budget is None else time.monotonic() + budget)
+
+    def _deadline_result(self, classification: dict = None) -> dict:
+        """Precomputed template for the category, flagged for manual review"""
+        classification = dict(classification or FALLBACK_CLASSIFICATION)
+        category = classification.get("category", "NEUTRAL")
+        classification["manual_required"] = True
+        self._count("deadline_fallbacks", category=category)
+        result = self._result(classification, self.templates.get(category) or self._fixed_response(category))
+        result["fallback"] = "deadline"
+        return result
+
+    def _speculate(self, message: str):
+        """Category to start generating for, or None if a guess wouldn't reach the model"""
+        guess = self.speculator.guess(message)
+        if guess is None or self._response_messages(message, guess) is None:
+            return None
+        return guess
+
+    def _timed_generate(self, message: str, category: str) -> tuple:
+        started = time.perf_counter()
+        reply = self.generate_response(message, category)
+        return reply, time.perf_counter() - started
+
+    def _settle(self, guess: str, category: str, classified: float, generated: float = None):
+        """Record a speculation outcome; generated is None on a miss"""
+        self.speculator.record(category)
+        if guess is None:
+            return
+        if generated is None:
+            self.speculator.miss()
+            self._count("speculation", outcome="miss")
+        else:
+            # Run back to back the two stages would have taken classified + generated
+            self.speculator.hit(min(classified, generated))
+            self._count("speculation", outcome="hit")
+
+    def process_speculative(self, message: str, recipient: str = None) -> dict:
+        """Generate for the likely category while the model classifies; discard the reply if it guessed wrong"""
+        started = time.perf_counter()
+        with self._span("classify"):
+            classification = self._classify_fast(message)
+            guess = self._speculate(message) if classification is None else None
+            pending = (self.speculation_pool.submit(contextvars.copy_context().run, self._timed_generate, message, guess)
+                       if guess else None)
+            if classification is None:
+                classification = self._classify_model(message)
+        classified = time.perf_counter() - started
+        category = classification.get("category", "NEUTRAL")
+
+        try:
+            response = self._pooled(message, classification, recipient)
+            if response is None and pending is not None and category == guess:
+                response, generated = pending.result()
+                self._settle(guess, category, classified, generated)
+            else:
+                if pending is not None:
+                    # Already running calls can't be stopped; their reply is dropped
+                    pending.cancel()
+                self._settle(guess, category, classified)
+                if response is None:
+                    response = self.generate_response(message, category)
+        except DeadlineExceeded as e:
+            e.classification = classification
+            raise
+        return self._result(classification, response)
+
+    def _thread_messages(self, message: str, category: str, context: str):
+        """Generation request with earlier turns inserted ahead of the newest reply"""
+        messages = self._response_messages(message, category)
+        if messages is not None and context:
+            messages.insert(-1, {"role": "system", "content": THREAD_CONTEXT.format(turns=context)})
+        return messages
+
+    def _start_thread(self, thread_id: str, history: list) -> str:
+        """Seed an unknown thread from history and return its context window"""
+        if history and thread_id not in self.threads:
+            self.threads.extend(thread_id, history)
+        return self.threads.context(thread_id)
+
+    def process_thread(self, thread_id: str, message: str, history: list = None) -> dict:
+        """Reply to the newest message in a thread, with a bounded window of earlier turns
+
+        history seeds a thread the store hasn't seen; later calls only pass the new reply.
+        """
+        with self._span("pipeline"):
+            message, stripped = self._prepare(message)
+            context = self._start_thread(thread_id, history)
+            classification = self.classify(message)
+            category = classification.get("category", "NEUTRAL")
+
+            if not context:
+                response = self.generate_response(message, category)
+            else:
+                messages = self._thread_messages(message, category, context)
+                if messages is None:
+                    response = self._fixed_response(category)
+                else:
+                    # Replies depend on the whole thread, so they bypass the response cache
+                    response = self._generate_llm(messages, category)
+
+            self.threads.extend(thread_id, [("lead", message), ("me", response)])
+            return self._report(self._result(classification, response), stripped)
+
+
+class AsyncAutoresponder(Autoresponder):
+    """Same pipeline as Autoresponder, on the async client, for batches of replies"""
+
+    def __init__(self, api_key: str, *args, max_concurrency: int = 20, **kwargs):
+        super().__init__(api_key, *args, **kwargs)
+        self.max_concurrency = max_concurrency
+
+    def _make_client(self, api_key: str, base_url: str = None, pool=None):
+        if self.transport == "urllib":
+            from lite_client import AsyncLiteClient
+            return AsyncLiteClient(api_key=api_key, base_url=base_url)
+        if pool is not None:
+            return pool.get_async(api_key, base_url)
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=api_key, base_url=base_url)
+
+    def _make_cassette_client(self, factory):
+        return self.cassette.async_client(factory)
+
+    def _make_flights(self):
+        return AsyncSingleFlight()
+
+    def _make_speculation_pool(self):
+        # Speculative replies run as tasks on the caller's event loop
+        return None
+
+    def _make_call_pool(self):
+        return None
+
+    async def _call(self, model: str, **kwargs):
+        if self.scheduler is not None:
+            return await self.scheduler.acall(self.client, model=model, **kwargs)
+        return await self.client.chat.completions.create(model=model, **kwargs)
+
+    async def _complete(self, stage: str, model: str = None, **kwargs):
+        """Run a single chat completion, on the configured model unless overridden"""
+        model = model or self.model
+        with self._span(f"llm_{stage}"):
+            left = self._budget(stage, kwargs)
+            if left is None and (self.hedger is None or kwargs.get("stream")):
+                response = await self._call(model, **kwargs)
+            else:
+                response = await self._race(stage, left, model, kwargs)
+        self._record_usage(stage, response)
+        return response
+
+    async def _race(self, stage: str, left, model: str, kwargs: dict):
+        """First answer from the call or, once it runs past the hedge delay, a duplicate of it"""
+        import asyncio
+        async def attempt():
+            return await self._call(model, **kwargs)
+
+        now = started = time.monotonic()
+        end = None if left is None else now + left
+        delay = self._hedge_delay(stage, kwargs)
+        hedge_at = None if delay is None or (end is not None and now + delay >= end) else now + delay
+        pending, hedge, error = {asyncio.ensure_future(attempt())}, None, None
+
+        try:
+            while pending:
+                wake = min((t for t in (end, hedge_at) if t is not None), default=None)
+                timeout = None if wake is None else max(0.0, wake - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    self._settle_race(stage, hedge, task, time.monotonic() - started)
+                    return response
+                now = time.monotonic()
+                if pending and hedge_at is not None and now >= hedge_at:
+                    hedge, hedge_at = asyncio.ensure_future(attempt()), None
+                    pending.add(hedge)
+                    self.hedger.hedged()
+                    self._count("hedges", stage=stage)
+                elif pending and end is not None and now >= end:
+                    if self.hedger is not None:
+                        self.hedger.record(stage, now - started)
+                    raise DeadlineExceeded(f"{stage} ran past the deadline")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _classify_llm(self, message: str) -> dict:
+        """Classify on the cheap model, escalating to the strong one when unsure"""
+        if self.classify_model is not None:
+            response = await self._complete("classify_cheap", model=self.classify_model,
+                                            **self._classifier_request(message))
+            result = self._parse_classifier_response(response)
+            if not self._needs_escalation(result):
+                result["tier"] = "cheap"
+                return result
+            self._count("escalations")
+
+        response = await self._complete("classify", **self._classifier_request(message))
+        result = self._parse_classifier_response(response)
+        result["tier"] = "strong"
+        return result
+
+    async def _classify_model(self, message: str) -> dict:
+        if self.flights is None:
+            result = await self._classify_llm(message)
+        else:
+            flight = self._flight_key("classify", message, self.classifier_mode, self.classify_model)
+            result = dict(await self.flights.do(flight, lambda: self._classify_llm(message)))
+        self._cache_put(self._cache_key("classify", message, self.classifier_mode, self.classify_model), result)
+        return self._tag(result, result.get("tier", "strong"))
+
+    async def classify(self, message: str) -> dict:
+        """Classify the incoming message into a category"""
+        with self._span("classify"):
+            result = self._classify_fast(message)
+            if result is None:
+                result = await self._classify_model(message)
+            return result
+
+    async def generate_response(self, message: str, category: str) -> str:
+        """Generate a response based on the category"""
+        messages = self._response_messages(message, category)
+        if messages is None:
+            return self._fixed_response(category)
+
+        key = self._cache_key("generate", message, category, self.calendar_link, self._tenant_fingerprint(),
+                              self._response_model(category))
+        variants = self.cache.variants if key else 1
+        cached = self._cache_get(key, variants)
+        if cached is not None:
+            return cached
+
+        if self.flights is not None and self.share_generation:
+            flight = self._flight_key("generate", message, category)
+            reply = await self.flights.do(flight, lambda: self._generate_llm(messages, category))
+        else:
+            reply = await self._generate_llm(messages, category)
+        self._cache_put(key, reply, variants)
+        return reply
+
+    async def _generate_llm(self, messages: list, category: str) -> str:
+        reply = await self._draft(messages, category)
+        violations = self._review(category, reply)
+        return await self._repair(messages, category, reply, violations) if violations else reply
+
+    async def _draft(self, messages: list, category: str) -> str:
+        response = await self._complete(
+            "generate",
+            model=self._response_model(category),
+            messages=messages,
+            temperature=0.7,
+            max_tokens=150,
+        )
+        return response.choices[0].message.content.strip()
+
+    async def _repair(self, messages: list, category: str, reply: str, violations: list) -> str:
+        attempts = 0
+        while violations and self.validator.allow_retry(attempts):
+            attempts += 1
+            self._count("regenerations", category=category)
+            candidate = await self._draft(self._rewrite_messages(messages, reply, violations), category)
+            found = self._check(category, candidate)
+            if len(found) < len(violations):
+                reply, violations = candidate, found
+        self.validator.settle(violations)
+        return reply
+
+    async def generate_response_stream(self, message: str, category: str):
+        """Generate a response based on the category, yielding text chunks as they arrive"""
+        messages = self._response_messages(message, category)
+        if messages is None:
+            yield self._fixed_response(category)
+            return
+
+        key = self._cache_key("generate", message, category, self.calendar_link, self._tenant_fingerprint(),
+                              self._response_model(category))
+        variants = self.cache.variants if key else 1
+        cached = self._cache_get(key, variants)
+        if cached is not None:
+            yield cached
+            return
+
+        stream = await self._complete(
+            "generate",
+            model=self._response_model(category),
+            messages=messages,
+            temperature=0.7,
+            max_tokens=150,
+            stream=True,
+        )
+        parts = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+
+        reply = "".join(parts).strip()
+        self._review(category, reply)
+        self._cache_put(key, reply, variants)
+
+    async def process_stream(self, message: str):
+        """Full pipeline as events: classification first, then reply deltas, then done"""
+        started = time.perf_counter()
+        message, stripped = self._prepare(message)
+        classification = await self.classify(message)
+        yield self._classification_event(classification)
+
+        first_token = None
+        parts = []
+        async for text in self.generate_response_stream(message, classification.get("category", "NEUTRAL")):
+            if first_token is None:
+                first_token = time.perf_counter()
+            parts.append(text)
+            yield {"type": "delta", "text": text}
+
+        yield self._report(self._done_event(started, first_token, classification, parts), stripped)
+
+    async def process_fused(self, message: str, recipient: str = None) -> dict:
+        """Classify and generate response in a single completion"""
+        local = self._local_classification(message)
+        if local is not None:
+            try:
+                response = self._pooled(message, local, recipient)
+                if response is None:
+                    response = await self.generate_response(message, local["category"])
+                return self._result(local, response)
+            except DeadlineExceeded as e:
+                e.classification = local
+                raise
+
+        response = await self._complete(
+            "fused",
+            messages=self._fused_messages(message),
+            temperature=0.7,
+            max_tokens=300,
+            response_format={"type": "json_object"},
+        )
+        classification, reply = self._fused_result(response.choices[0].message.content)
+        self._tag(classification, "fused")
+        category = classification.get("category", "NEUTRAL")
+        try:
+            if not reply:
+                reply = await self.generate_response(message, category)
+            elif violations := self._review(category, reply):
+                reply = await self._repair(self._response_messages(message, category), category, reply, violations)
+        except DeadlineExceeded as e:
+            e.classification = classification
+            raise
+        return self._result(classification, reply)
+
+    async def process(self, message: str, deadline: float = None, recipient: str = None) -> dict:
+        """Full pipeline: classify and generate response, within an optional latency budget"""
+        with self._span("pipeline"):
+            message, stripped = self._prepare(message)
+            token = self._start_deadline(deadline)
+            classification = None
+            try:
+                if self.mode == "fused":
+                    result = await self.process_fused(message, recipient)
+                elif self.speculator is not None:
+                    result = await self.process_speculative(message, recipient)
+                else:
+                    classification = await self.classify(message)
+                    category = classification.get("category", "NEUTRAL")
+
+                    response = self._pooled(message, classification, recipient)
+                    if response is None:
+                        response = await self.generate_response(message, category)
+
+                    result = self._result(classification, response)
+            except DeadlineExceeded as e:
+                result = self._deadline_result(classification or e.classification)
+            finally:
+                DEADLINE.reset(token)
+            return self._report(result, stripped)
+
+    async def _timed_generate(self, message: str, category: str) -> tuple:
+        started = time.perf_counter()
+        reply = await self.generate_response(message, category)
+        return reply, time.perf_counter() - started
+
+    async def process_speculative(self, message: str, recipient: str = None) -> dict:
+        """Generate for the likely category while the model classifies; cancel the reply if it guessed wrong"""
+        import asyncio
+        started = time.perf_counter()
+        with self._span("classify"):
+            classification = self._classify_fast(message)
+            guess = self._speculate(message) if classification is None else None
+            pending = asyncio.ensure_future(self._timed_generate(message, guess)) if guess else None
+            try:
+                if classification is None:
+                    classification = await self._classify_model(message)
+            except BaseException:
+                if pending is not None:
+                    pending.cancel()
+                raise
+        classified = time.perf_counter() - started
+        category = classification.get("category", "NEUTRAL")
+
+        try:
+            response = self._pooled(message, classification, recipient)
+            if response is None and pending is not None and category == guess:
+                response, generated = await pending
+                self._settle(guess, category, classified, generated)
+            else:
+                if pending is not None:
+                    pending.cancel()
+                self._settle(guess, category, classified)
+                if response is None:
+                    response = await self.generate_response(message, category)
+        except DeadlineExceeded as e:
+            e.classification = classification
+            raise
+        return self._result(classification, response)
+
+    async def process_thread(self, thread_id: str, message: str, history: list = None) -> dict:
+        """Reply to the newest message in a thread, with a bounded window of earlier turns
+
+        history seeds a thread the store hasn't seen; later calls only pass the new reply.
+        """
+        with self._span("pipeline"):
+            message, stripped = self._prepare(message)
+            context = self._start_thread(thread_id, history)
+            classification = await self.classify(message)
+            category = classification.get("category", "NEUTRAL")
+
+            if not context:
+                response = await self.generate_response(message, category)
+            else:
+                messages = self._thread_messages(message, category, context)
+                if messages is None:
+                    response = self._fixed_response(category)
+                else:
+                    response = await self._generate_llm(messages, category)
+
+            self.threads.extend(thread_id, [("lead", message), ("me", response)])
+            return self._report(self._result(classification, response), stripped)
+
+    def _bounded(self, messages: list) -> list:
+        """Wrap process() calls so at most max_concurrency run at once"""
+        import asyncio
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(index, message):
+            async with semaphore:
+                return index, await self.process(message)
+
+        return [run(i, m) for i, m in enumerate(messages)]
+
+    async def process_many(self, messages: list, return_exceptions: bool = False) -> list:
+        """Process a batch concurrently, results in input order"""
+        import asyncio
+        results = await asyncio.gather(*self._bounded(messages), return_exceptions=return_exceptions)
+        ordered = [None] * len(messages)
+        for i, item in enumerate(results):
+            if isinstance(item, BaseException):
+                ordered[i] = item
+            else:
+                index, result = item
+                ordered[index] = result
+        return ordered
+
+    async def process_as_completed(self, messages: list):
+        """Process a batch concurrently, yielding (index, result) as each finishes"""
+        import asyncio
+        for future in asyncio.as_completed(self._bounded(messages)):
+            yield await future
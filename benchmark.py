@@ -0,0 +1,253 @@
+"""
+Benchmark harness - throughput and latency of the pipeline against the local mock LLM
+"""
+import argparse
+import asyncio
+import json
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from autoresponder import CLASSIFIER_MODES, TRANSPORTS, AsyncAutoresponder, Autoresponder
+from cassette import MISS_POLICIES, MODES as CASSETTE_MODES, Cassette
+from clients import ClientPool
+from deadline import Hedger
+from metrics import Metrics
+from mock_server import MOCK_CALENDAR_LINK, MockLLMServer
+from output_rules import OutputValidator
+from scheduler import Scheduler
+from speculation import Speculator
+
+# A mix of the reply shapes seen after a campaign
+WORKLOAD = [
+    "Sure, let's chat. Send me your calendar.",
+    "Interesting. How does this work?",
+    "What company are you with?",
+    "Not a priority right now, maybe later.",
+    "Not interested, please remove me.",
+    "ok sure",
+    "Can you tell me more about what this involves?",
+    "We already have this handled internally.",
+    "How much does it cost and who else do you work with?",
+    "Happy to chat next week, what times work?",
+]
+
+PATHS = ("sync", "async", "batch", "fused", "speculative")
+
+EMPTY = {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None}
+
+
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def timed(responder: Autoresponder, message: str) -> dict:
+    """Run one reply through process(), the same entry point production traffic uses"""
+    started = time.perf_counter()
+    try:
+        result = responder.process(message)
+        return {"end_to_end": time.perf_counter() - started, "fallback": "fallback" in result}
+    except Exception as e:
+        return {"error": type(e).__name__}
+
+
+async def atimed(responder: AsyncAutoresponder, message: str) -> dict:
+    started = time.perf_counter()
+    try:
+        result = await responder.process(message)
+        return {"end_to_end": time.perf_counter() - started, "fallback": "fallback" in result}
+    except Exception as e:
+        return {"error": type(e).__name__}
+
+
+def run_threads(responder: Autoresponder, messages: list, concurrency: int) -> list:
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda m: timed(responder, m), messages))
+
+
+async def run_async(responder: AsyncAutoresponder, messages: list, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(message):
+        async with semaphore:
+            return await atimed(responder, message)
+
+    return await asyncio.gather(*(one(m) for m in messages))
+
+
+async def run_batch(responder: AsyncAutoresponder, messages: list) -> list:
+    """One process_many() call; per-reply latency comes from the pipeline span"""
+    results = await responder.process_many(messages, return_exceptions=True)
+    return [{"error": type(r).__name__} if isinstance(r, BaseException) else {"fallback": "fallback" in r}
+            for r in results]
+
+
+def report(path: str, concurrency: int, samples: list, elapsed: float, metrics: Metrics) -> dict:
+    ok = [s for s in samples if "error" not in s]
+    stages = metrics.summary()["stages"]
+    end_to_end = [s["end_to_end"] for s in ok if "end_to_end" in s]
+    errors = {}
+    for s in samples:
+        if "error" in s:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+    return {
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": errors,
+        "elapsed": elapsed,
+        "rps": len(ok) / elapsed if elapsed else None,
+        "classify": stages.get("classify", EMPTY),
+        "generate": stages.get("llm_fused" if path == "fused" else "llm_generate", EMPTY),
+        "end_to_end": summarize(end_to_end) if end_to_end else stages.get("pipeline", EMPTY),
+        "stages": stages,
+        "fallbacks": sum(1 for s in ok if s.get("fallback")),
+    }
+
+
+def bench(path: str, concurrency: int, messages: list, base_url: str, args) -> dict:
+    scheduler = Scheduler(rpm=args.rpm, tpm=args.tpm, max_concurrency=concurrency) if args.scheduler else None
+    pool = ClientPool(max_connections=max(concurrency, 10), max_retries=args.max_retries)
+    options = {"base_url": base_url, "pool": pool, "scheduler": scheduler, "classifier_mode": args.classifier_mode,
+               "classify_model": args.classify_model, "deadline": args.deadline,
+               "hedger": Hedger(percentile=args.hedge) if args.hedge else None, "transport": args.transport,
+               "cassette": Cassette(args.cassette, args.cassette_mode, args.miss) if args.cassette else None,
+               "validator": OutputValidator(budget=args.retry_budget) if args.validate else None}
+    metrics = options["metrics"] = Metrics(window=max(2048, 4 * len(messages)))
+    if args.validate:
+        # The mock's replies carry its own link, which the calendar rule checks for
+        options["calendar_link"] = MOCK_CALENDAR_LINK
+
+    if path in ("async", "batch"):
+        async def run():
+            responder = AsyncAutoresponder("mock", max_concurrency=concurrency, **options)
+            started = time.perf_counter()
+            if path == "batch":
+                samples = await run_batch(responder, messages)
+            else:
+                samples = await run_async(responder, messages, concurrency)
+            elapsed = time.perf_counter() - started
+            await responder.client.close()
+            return samples, elapsed
+        samples, elapsed = asyncio.run(run())
+    else:
+        if path == "fused":
+            options["mode"] = "fused"
+        if path == "speculative":
+            options["speculator"] = Speculator()
+        responder = Autoresponder("mock", **options)
+        started = time.perf_counter()
+        samples = run_threads(responder, messages, concurrency)
+        elapsed = time.perf_counter() - started
+        pool.close()
+
+    row = report(path, concurrency, samples, elapsed, metrics)
+    if options["cassette"] is not None:
+        row["cassette"] = options["cassette"].stats()
+        options["cassette"].close()
+    if path == "speculative":
+        row["speculation"] = responder.speculator.stats()
+    if options["validator"] is not None:
+        row["output_rules"] = options["validator"].stats()
+    return row
+
+
+def print_row(row: dict):
+    e2e = row["end_to_end"]
+    fmt = lambda v: f"{v * 1000:7.0f}" if v is not None else "      -"
+    errors = sum(row["errors"].values())
+    print(f"{row['path']:>6} c={row['concurrency']:<4} {row['rps']:8.1f} rps"
+          f"  e2e p50/p95/p99 {fmt(e2e['p50'])} {fmt(e2e['p95'])} {fmt(e2e['p99'])} ms"
+          f"  classify p95 {fmt(row['classify']['p95'])}  generate p95 {fmt(row['generate']['p95'])}"
+          f"  errors {errors}  fallbacks {row['fallbacks']}")
+    if "speculation" in row:
+        spec = row["speculation"]
+        print(f"{'':>6} speculation hit rate {spec['hit_rate']:.0%}  saved {spec['saved_per_attempt'] * 1000:.0f} ms/attempt")
+    if "output_rules" in row:
+        rules = row["output_rules"]
+        print(f"{'':>6} rule violations {rules['violation_rate']:.0%} of {rules['checked']}  regenerated {rules['retries']}"
+              f"  repaired {rules['repaired']}  unrepaired {rules['unrepaired']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the autoresponder against a local mock LLM")
+    parser.add_argument("--requests", type=int, default=200, help="replies per run")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--paths", default="sync,async", help=f"comma-separated subset of {','.join(PATHS)}")
+    parser.add_argument("--latency", default="lognormal:0.6,0.4", help="mock latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--violation-rate", type=float, default=0.0, help="fraction of mock replies that break a rule")
+    parser.add_argument("--classifier-mode", default="json", choices=CLASSIFIER_MODES)
+    parser.add_argument("--classify-model", help="cheap model tried before escalating to the strong one")
+    parser.add_argument("--transport", default="openai", choices=TRANSPORTS, help="HTTP client for model calls")
+    parser.add_argument("--max-retries", type=int, default=2, help="SDK retries per call")
+    parser.add_argument("--scheduler", action="store_true", help="route calls through the rate-limit scheduler")
+    parser.add_argument("--rpm", type=int, default=10000)
+    parser.add_argument("--tpm", type=int, default=2000000)
+    parser.add_argument("--base-url", help="benchmark an already running endpoint instead of the built-in mock")
+    parser.add_argument("--deadline", type=float, help="latency budget per reply")
+    parser.add_argument("--hedge", type=float, help="hedge calls slower than this latency percentile, e.g. 95")
+    parser.add_argument("--cassette", help="record model calls to, or replay them from, this file")
+    parser.add_argument("--cassette-mode", default="replay", choices=CASSETTE_MODES)
+    parser.add_argument("--miss", default="fail", choices=MISS_POLICIES, help="replay policy for unrecorded calls")
+    parser.add_argument("--validate", action="store_true", help="check replies against the prompt rules and regenerate")
+    parser.add_argument("--retry-budget", type=float, default=0.25, help="regenerations allowed per checked reply")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_results.json", help="machine-readable results file")
+    args = parser.parse_args()
+
+    paths = [p for p in args.paths.split(",") if p]
+    for path in paths:
+        if path not in PATHS:
+            parser.error(f"unknown path {path!r}")
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    messages = [WORKLOAD[i % len(WORKLOAD)] for i in range(args.requests)]
+
+    mock = None
+    base_url = args.base_url
+    if base_url is None:
+        mock = MockLLMServer(args.latency, args.error_rate, args.rate_limit_rate, seed=args.seed,
+                             violation_rate=args.violation_rate)
+        base_url = f"http://127.0.0.1:{mock.start_in_thread()}/v1"
+
+    rows = []
+    try:
+        for path in paths:
+            for concurrency in levels:
+                row = bench(path, concurrency, messages, base_url, args)
+                print_row(row)
+                rows.append(row)
+    finally:
+        if mock is not None:
+            mock.stop_thread()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "mock": mock.stats if mock else None,
+        "runs": rows,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Bulk runner - process a JSONL, mbox or Maildir backlog with sharded workers, resumable from a checkpoint
+"""
+import argparse
+import asyncio
+import email
+import email.policy
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sqlite3
+import sys
+import time
+import zlib
+
+from autoresponder import CLASSIFIER_MODES, MODES, AsyncAutoresponder
+from cassette import MISS_POLICIES, MODES as CASSETTE_MODES, Cassette
+from output_rules import OutputValidator
+from reply_text import EmailPreprocessor
+from scheduler import Scheduler
+from server import ID_FIELDS, MESSAGE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jsonl", "mbox", "maildir")
+
+
+def detect_format(path: str) -> str:
+    if os.path.isdir(path):
+        return "maildir"
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "mbox"
+
+
+def records(path: str, fmt: str):
+    """Yield (shard key, raw record) one at a time; only the current record is held in memory"""
+    if fmt == "jsonl":
+        with open(path, "rb") as f:
+            for index, line in enumerate(f):
+                if line.strip():
+                    yield index, line
+    elif fmt == "mbox":
+        yield from _mbox_records(path)
+    else:
+        for sub in ("cur", "new"):
+            folder = os.path.join(path, sub)
+            if not os.path.isdir(folder):
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        # Shard on the unique part of the name; flags after ':' change when mail is read
+                        yield zlib.crc32(entry.name.split(":")[0].encode()), entry.path
+
+
+def _mbox_records(path: str):
+    index, lines, previous_blank = 0, [], True
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"From ") and previous_blank:
+                if lines:
+                    yield index, b"".join(lines)
+                    index += 1
+                lines = []
+            else:
+                lines.append(line[1:] if line.startswith(b">From ") else line)
+            previous_blank = not line.strip()
+    if lines:
+        yield index, b"".join(lines)
+
+
+def parse(fmt: str, key: int, raw) -> tuple:
+    """(id, message) for a raw record, or None if it has no reply text"""
+    if fmt == "jsonl":
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return None
+        if not isinstance(payload, dict):
+            return None
+        message = next((payload[f] for f in MESSAGE_FIELDS if isinstance(payload.get(f), str)), None)
+        item_id = next((str(payload[f]) for f in ID_FIELDS if payload.get(f) is not None), f"line-{key + 1}")
+    else:
+        if fmt == "maildir":
+            with open(raw, "rb") as f:
+                raw = f.read()
+        msg = email.message_from_bytes(raw, policy=email.policy.default)
+        body = msg.get_body(preferencelist=("plain", "html"))
+        try:
+            message = body.get_content() if body is not None else None
+        except (LookupError, ValueError):
+            message = None
+        item_id = (msg.get("Message-ID") or "").strip().strip("<>") or f"{fmt}-{key}"
+    if not message or not message.strip():
+        return None
+    return item_id, message
+
+
+class Checkpoint:
+    """Ids already written, in SQLite so workers can skip them while the writer adds more"""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS done (id TEXT PRIMARY KEY)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+    def __contains__(self, item_id: str) -> bool:
+        return self._db.execute("SELECT 1 FROM done WHERE id = ?", (item_id,)).fetchone() is not None
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM done").fetchone()[0]
+
+    def get(self, key: str, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def mark(self, ids: list, **meta):
+        """Record ids (and meta values) in the current transaction; commit() makes them durable"""
+        self._db.executemany("INSERT OR IGNORE INTO done (id) VALUES (?)", [(i,) for i in ids])
+        self._db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [(k, str(v)) for k, v in meta.items()])
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+class JsonlSink:
+    """Appends one JSON line per result; a resumed run truncates anything written after the last checkpoint"""
+
+    def __init__(self, path: str):
+        self.checkpoint_path = f"{path}.ckpt"
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size and not os.path.exists(self.checkpoint_path):
+            raise ValueError(f"{path} already exists without a checkpoint; pick a new output file")
+        self.checkpoint = Checkpoint(self.checkpoint_path)
+        offset = int(self.checkpoint.get("offset", 0))
+        if size < offset:
+            self.checkpoint.close()
+            raise ValueError(f"{path} is shorter than its checkpoint {self.checkpoint_path} records")
+        self._file = open(path, "ab")
+        self._file.truncate(offset)
+
+    def write(self, result: dict):
+        self._file.write(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def commit(self, ids: list):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.checkpoint.mark(ids, offset=self._file.tell())
+        self.checkpoint.commit()
+
+    def close(self):
+        self._file.close()
+        self.checkpoint.close()
+
+
+class SqliteSink:
+    """Results table in the same database as the checkpoint, committed together"""
+
+    def __init__(self, path: str):
+        self.checkpoint_path = path
+        self.checkpoint = Checkpoint(path)
+        self._db = self.checkpoint._db
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "id TEXT PRIMARY KEY, category TEXT, confidence TEXT, manual_required INTEGER, "
+            "response TEXT, tier TEXT, result TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def write(self, result: dict):
+        self._db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (result["id"], result.get("category"), result.get("confidence"), int(bool(result.get("manual_required"))),
+             result.get("response"), result.get("tier"), json.dumps(result, ensure_ascii=False)),
+        )
+
+    def commit(self, ids: list):
+        self.checkpoint.mark(ids)
+        self.checkpoint.commit()
+
+    def close(self):
+        self.checkpoint.close()
+
+
+def open_sink(path: str):
+    return SqliteSink(path) if path.endswith((".db", ".sqlite", ".sqlite3")) else JsonlSink(path)
+
+
+async def run_shard(shard: int, args, checkpoint_path: str, results) -> dict:
+    """Process this worker's share of the input, at most args.concurrency replies at a time"""
+    cassette = Cassette(args.cassette, args.cassette_mode, args.miss) if args.cassette else None
+    # Replays that never reach the provider have no rate limits to respect
+    offline = cassette is not None and cassette.mode == "replay" and cassette.miss != "passthrough"
+    validator = OutputValidator(budget=args.retry_budget) if args.validate else None
+    responder = AsyncAutoresponder(
+        api_key=os.environ.get("OPENAI_API_KEY", ""),
+        calendar_link=args.calendar_link,
+        mode=args.mode,
+        classifier_mode=args.classifier_mode,
+        classify_model=args.classify_model,
+        base_url=args.base_url,
+        scheduler=None if offline else Scheduler(rpm=args.rpm / args.workers, tpm=args.tpm / args.workers,
+                                                 max_concurrency=args.concurrency),
+        preprocessor=EmailPreprocessor() if args.strip_quotes else None,
+        cassette=cassette,
+        validator=validator,
+        max_concurrency=args.concurrency,
+    )
+    done = sqlite3.connect(f"file:{checkpoint_path}?mode=ro", uri=True)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    pending = set()
+    stats = {"shard": shard, "skipped": 0, "resumed": 0}
+
+    async def one(item_id, message):
+        try:
+            result = {"id": item_id, **(await responder.process(message))}
+        except Exception as e:
+            result = {"id": item_id, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            semaphore.release()
+        await loop.run_in_executor(None, results.put, ("result", result))
+
+    for key, raw in records(args.input, args.format):
+        if key % args.workers != shard:
+            continue
+        item = parse(args.format, key, raw)
+        if item is None:
+            stats["skipped"] += 1
+            continue
+        if done.execute("SELECT 1 FROM done WHERE id = ?", (item[0],)).fetchone():
+            stats["resumed"] += 1
+            continue
+        await semaphore.acquire()
+        task = asyncio.create_task(one(*item))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    await asyncio.gather(*pending)
+    done.close()
+    if responder._client is not None:
+        # Building the client only to close it would import the SDK for nothing
+        await responder._client.close()
+    if cassette is not None:
+        stats["cassette"] = cassette.stats()
+        cassette.close()
+    if validator is not None:
+        stats["output_rules"] = validator.stats()
+    return stats
+
+
+def worker(shard: int, args, checkpoint_path: str, results):
+    try:
+        stats = asyncio.run(run_shard(shard, args, checkpoint_path, results))
+    except KeyboardInterrupt:
+        return
+    except Exception as e:
+        stats = {"shard": shard, "crashed": f"{type(e).__name__}: {e}"}
+    results.put(("done", stats))
+
+
+def run(args) -> dict:
+    """Start the workers and write their results in this process; returns run totals"""
+    sink = open_sink(args.output)
+    totals = {"written": 0, "failed": 0, "duplicates": 0, "skipped": 0, "resumed": 0, "crashed": 0,
+              "previous": sink.checkpoint.count()}
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue(maxsize=args.workers * args.concurrency * 2)
+    processes = [
+        context.Process(target=worker, args=(shard, args, sink.checkpoint_path, results), daemon=True)
+        for shard in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    started = time.monotonic()
+    batch, running = [], len(processes)
+    try:
+        while running:
+            try:
+                kind, payload = results.get(timeout=1.0)
+            except queue.Empty:
+                if not any(p.is_alive() for p in processes):
+                    # Shards that died without reporting, e.g. killed by the OS
+                    totals["crashed"] += running
+                    logger.error("%d shard(s) exited without reporting", running)
+                    break
+                continue
+
+            if kind == "done":
+                running -= 1
+                if "crashed" in payload:
+                    totals["crashed"] += 1
+                    logger.error("Shard %s crashed: %s", payload["shard"], payload["crashed"])
+                totals["skipped"] += payload.get("skipped", 0)
+                totals["resumed"] += payload.get("resumed", 0)
+                for name, value in payload.get("cassette", {}).items():
+                    if name in ("hits", "misses", "recorded", "stubbed"):
+                        totals[f"cassette_{name}"] = totals.get(f"cassette_{name}", 0) + value
+                for name, value in payload.get("output_rules", {}).items():
+                    if name in ("checked", "violations", "retries", "repaired", "unrepaired"):
+                        totals[f"rules_{name}"] = totals.get(f"rules_{name}", 0) + value
+                continue
+            if "error" in payload:
+                # Not checkpointed, so the next run retries it
+                totals["failed"] += 1
+                logger.warning("Reply %s failed: %s", payload["id"], payload["error"])
+                continue
+            if payload["id"] in sink.checkpoint or payload["id"] in batch:
+                totals["duplicates"] += 1
+                continue
+
+            sink.write(payload)
+            batch.append(payload["id"])
+            totals["written"] += 1
+            if len(batch) >= args.checkpoint_every:
+                sink.commit(batch)
+                batch = []
+                elapsed = time.monotonic() - started
+                logger.info("%d written, %d failed, %.1f replies/s", totals["written"], totals["failed"],
+                            totals["written"] / elapsed if elapsed else 0.0)
+    finally:
+        sink.commit(batch)
+        sink.close()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the autoresponder over a backlog of replies")
+    parser.add_argument("input", help="JSONL file, mbox file or Maildir directory")
+    parser.add_argument("output", help="results file: .jsonl, or .db/.sqlite for SQLite")
+    parser.add_argument("--format", choices=FORMATS, help="input format; guessed from the path by default")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)), help="worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="replies in flight per worker")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="results written between checkpoints")
+    parser.add_argument("--strip-quotes", action="store_true", help="reduce email bodies to the new reply")
+    parser.add_argument("--calendar-link", default="https://cal.com/your-calendar")
+    parser.add_argument("--mode", default="two_stage", choices=MODES)
+    parser.add_argument("--classifier-mode", default="json", choices=CLASSIFIER_MODES)
+    parser.add_argument("--classify-model", help="cheap model tried before escalating to the strong one")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint, e.g. a local mock")
+    parser.add_argument("--cassette", help="record model calls to, or replay them from, this file")
+    parser.add_argument("--cassette-mode", default="replay", choices=CASSETTE_MODES)
+    parser.add_argument("--miss", default="fail", choices=MISS_POLICIES, help="replay policy for unrecorded calls")
+    parser.add_argument("--validate", action="store_true", help="check replies against the prompt rules and regenerate")
+    parser.add_argument("--retry-budget", type=float, default=0.25, help="regenerations allowed per checked reply")
+    parser.add_argument("--rpm", type=int, default=500, help="requests per minute, split across workers")
+    parser.add_argument("--tpm", type=int, default=30000, help="tokens per minute, split across workers")
+    args = parser.parse_args()
+    args.format = args.format or detect_format(args.input)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+
+    try:
+        totals = run(args)
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; run the same command again to resume")
+        sys.exit(130)
+    print(json.dumps(totals))
+    if totals["crashed"] or totals["failed"]:
+        # Unfinished replies are not checkpointed; a non-zero exit tells scripts to run again
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Response cache - in-memory LRU with TTL, optional SQLite tier that survives restarts
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import prompts
+from fastpath import normalize
+
+
+def prompt_version() -> str:
+    """Short hash of every prompt constant, so edits to prompts.py invalidate the cache"""
+    constants = {
+        name: getattr(prompts, name)
+        for name in sorted(dir(prompts))
+        if name.isupper()
+    }
+    blob = json.dumps(constants, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:12]
+
+
+class ResponseCache:
+    """Caches classifications and replies; replies can keep several variants per key"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 24 * 3600, path: str = None, variants: int = 1):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        self.version = prompt_version()
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # key -> [expires_at, values, cursor]
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT NOT NULL, idx INTEGER NOT NULL, value TEXT NOT NULL, expires REAL NOT NULL, "
+                "PRIMARY KEY (key, idx))"
+            )
+            self._db.commit()
+
+    def key(self, kind: str, message: str, *parts) -> str:
+        """Cache key from the normalized message, the extra parts and the prompt version"""
+        blob = json.dumps([kind, normalize(message), *parts, self.version])
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _load(self, key: str, now: float):
+        """Fetch an entry from memory, falling back to the SQLite tier"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(key)
+            return entry
+        if entry is not None:
+            del self._entries[key]
+        if self._db is None:
+            return None
+
+        rows = self._db.execute(
+            "SELECT value, expires FROM cache WHERE key = ? AND expires > ? ORDER BY idx",
+            (key, now),
+        ).fetchall()
+        if not rows:
+            return None
+        entry = [min(r[1] for r in rows), [json.loads(r[0]) for r in rows], 0]
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key: str, entry: list):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str, variants: int = 1):
+        """Cached value, rotating through variants; None until all variants are filled"""
+        now = time.time()
+        with self._lock:
+            entry = self._load(key, now)
+            if entry is None or len(entry[1]) < variants:
+                self.misses += 1
+                return None
+            self.hits += 1
+            value = entry[1][entry[2] % len(entry[1])]
+            entry[2] += 1
+            return value
+
+    def put(self, key: str, value, variants: int = 1):
+        """Add a value; once the key holds `variants` values the oldest is replaced"""
+        now = time.time()
+        with self._lock:
+            entry = self._load(key, now)
+            if entry is None:
+                entry = [now + self.ttl, [], 0]
+                self._store(key, entry)
+            values = entry[1]
+            if len(values) >= variants:
+                values.pop(0)
+            values.append(value)
+
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._db.executemany(
+                    "INSERT INTO cache (key, idx, value, expires) VALUES (?, ?, ?, ?)",
+                    [(key, i, json.dumps(v), entry[0]) for i, v in enumerate(values)],
+                )
+                self._db.commit()
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "prompt_version": self.version,
+        }
@@ -0,0 +1,268 @@
+"""
+Cassettes - record model calls to SQLite and replay them without the network
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from lite_client import Record
+
+MODES = ("record", "replay")
+# What replay does with a request it has no recording for
+MISS_POLICIES = ("fail", "passthrough", "stub")
+
+# Request fields that change how a call is made, not what it returns
+TRANSPORT_FIELDS = ("timeout", "extra_headers", "extra_query", "extra_body")
+
+STUB_CLASSIFICATION = {"category": "NEUTRAL", "confidence": "low", "manual_required": True, "response": ""}
+STUB_REPLY = "[no recorded reply]"
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recording for a request and the miss policy is fail"""
+
+
+def request_key(kwargs: dict) -> str:
+    """Stable hash of a chat completion request, ignoring transport-only fields"""
+    request = {k: v for k, v in kwargs.items() if k not in TRANSPORT_FIELDS}
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _dump(response) -> dict:
+    dump = getattr(response, "model_dump", None)
+    return dump(mode="json") if dump is not None else response
+
+
+def _completion(content: str) -> dict:
+    return {
+        "object": "chat.completion",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "logprobs": None, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _chunks(content: str) -> list:
+    return [
+        {"object": "chat.completion.chunk",
+         "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]},
+        {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+    ]
+
+
+class Cassette:
+    """Request/response pairs keyed by request_key(), in a SQLite file held in memory once opened
+
+    record: every call goes to the network and its answer is stored, replacing
+    any earlier one. replay: recorded answers come back without the network;
+    a miss raises CassetteMiss (fail), is called and recorded (passthrough),
+    or gets a canned answer (stub) that parses as a low-confidence NEUTRAL
+    classification or a placeholder reply. Streams are stored chunk by chunk.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", miss: str = "fail", stub=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {MODES}")
+        if miss not in MISS_POLICIES:
+            raise ValueError(f"Unknown miss policy {miss!r}, expected one of {MISS_POLICIES}")
+        self.path = path
+        self.mode = mode
+        self.miss = miss
+        self.stub = stub
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.stubbed = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS interactions (key TEXT PRIMARY KEY, request TEXT NOT NULL, "
+            "response TEXT NOT NULL, stream INTEGER NOT NULL, recorded REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._db.commit()
+        self._entries = dict(self._db.execute("SELECT key, response FROM interactions")) if mode == "replay" else {}
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+
+    def lookup(self, kwargs: dict) -> tuple:
+        """(key, answer) where answer is the recorded or stubbed response, or None if the call must be made"""
+        key = request_key(kwargs)
+        if self.mode == "record":
+            return key, None
+        payload = self._entries.get(key)
+        with self._lock:
+            if payload is not None:
+                self.hits += 1
+                return key, json.loads(payload, object_hook=Record)
+            self.misses += 1
+            if self.miss == "fail":
+                raise CassetteMiss(f"No recording for request {key[:12]} (model {kwargs.get('model')})")
+            if self.miss == "stub":
+                self.stubbed += 1
+                return key, json.loads(json.dumps(self._stub(kwargs)), object_hook=Record)
+        return key, None
+
+    def _stub(self, kwargs: dict):
+        if self.stub is not None:
+            content = self.stub(kwargs)
+        elif kwargs.get("response_format"):
+            content = json.dumps(STUB_CLASSIFICATION)
+        else:
+            content = STUB_REPLY
+        return _chunks(content) if kwargs.get("stream") else _completion(content)
+
+    def put(self, key: str, kwargs: dict, payload):
+        """Store an answer: a completion dict, or a list of chunk dicts for a stream"""
+        request = {k: v for k, v in kwargs.items() if k not in TRANSPORT_FIELDS}
+        response = json.dumps(payload)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO interactions (key, request, response, stream, recorded) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(request, default=str), response, int(bool(kwargs.get("stream"))), time.time()),
+            )
+            self._db.commit()
+            if self.mode == "replay":
+                self._entries[key] = response
+            self.recorded += 1
+
+    def client(self, factory) -> "CassetteClient":
+        """Client for Autoresponder; factory builds the real client on the first call that needs it"""
+        return CassetteClient(self, factory)
+
+    def async_client(self, factory) -> "AsyncCassetteClient":
+        return AsyncCassetteClient(self, factory)
+
+    def close(self):
+        self._db.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "recorded": self.recorded,
+            "stubbed": self.stubbed,
+            "entries": len(self._entries),
+        }
+
+
+class _Completions:
+    def __init__(self, client: "CassetteClient"):
+        self._client = client
+
+    def create(self, **kwargs):
+        cassette = self._client.cassette
+        key, answer = cassette.lookup(kwargs)
+        if answer is not None:
+            return iter(answer) if kwargs.get("stream") else answer
+        response = self._client.inner().chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._recording(key, kwargs, response)
+        cassette.put(key, kwargs, _dump(response))
+        return response
+
+    def _recording(self, key: str, kwargs: dict, stream):
+        chunks = []
+        for chunk in stream:
+            chunks.append(_dump(chunk))
+            yield chunk
+        self._client.cassette.put(key, kwargs, chunks)
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, **kwargs):
+        cassette = self._client.cassette
+        key, answer = cassette.lookup(kwargs)
+        if answer is not None:
+            return _aiterate(answer) if kwargs.get("stream") else answer
+        response = await self._client.inner().chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._arecording(key, kwargs, response)
+        cassette.put(key, kwargs, _dump(response))
+        return response
+
+    async def _arecording(self, key: str, kwargs: dict, stream):
+        chunks = []
+        async for chunk in stream:
+            chunks.append(_dump(chunk))
+            yield chunk
+        self._client.cassette.put(key, kwargs, chunks)
+
+
+async def _aiterate(chunks: list):
+    for chunk in chunks:
+        yield chunk
+
+
+class _Chat:
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class CassetteClient:
+    """Stands in for OpenAI() in front of a real client built only when a call misses the cassette"""
+
+    def __init__(self, cassette: Cassette, factory):
+        self.cassette = cassette
+        self._factory = factory
+        self._inner = None
+        self._lock = threading.Lock()
+        self.chat = _Chat(self._completions())
+
+    def _completions(self):
+        return _Completions(self)
+
+    def with_options(self, **options):
+        """Copy on the same cassette whose real client is built with with_options(**options)"""
+        return type(self)(self.cassette, lambda: self.inner().with_options(**options))
+
+    def inner(self):
+        if self._inner is None:
+            with self._lock:
+                if self._inner is None:
+                    self._inner = self._factory()
+        return self._inner
+
+    def close(self):
+        if self._inner is not None:
+            self._inner.close()
+
+
+class AsyncCassetteClient(CassetteClient):
+    def _completions(self):
+        return _AsyncCompletions(self)
+
+    async def close(self):
+        if self._inner is not None:
+            await self._inner.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a cassette of recorded model calls")
+    parser.add_argument("path", help="cassette database file")
+    parser.add_argument("--list", action="store_true", help="print one line per recording")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.path, mode="record")
+    rows = cassette._db.execute("SELECT key, request, stream, recorded FROM interactions ORDER BY recorded").fetchall()
+    models = {}
+    for key, request, stream, recorded in rows:
+        model = json.loads(request).get("model")
+        models[model] = models.get(model, 0) + 1
+        if args.list:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(recorded))
+            print(f"{key[:12]}  {when}  {model}{'  stream' if stream else ''}")
+    print(f"{len(rows)} recordings: " + ", ".join(f"{model} {count}" for model, count in sorted(models.items())))
+    cassette.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Client pool - one long-lived OpenAI client per API key and base URL
+"""
+import threading
+import time
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+
+class ClientPool:
+    """Process-wide OpenAI clients with keep-alive connection pools
+
+    Sync clients can be shared freely between threads. Async clients hold
+    connections bound to the event loop that first used them, so share
+    those only within one loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 2,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.keepalive_expiry = keepalive_expiry
+        self.max_retries = max_retries
+
+        self._clients = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _get(self, kind: str, api_key: str, base_url: str = None):
+        key = (kind, api_key, base_url)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create(kind, api_key, base_url)
+                self._clients[key] = client
+                self.created += 1
+            else:
+                self.reused += 1
+            self._last_used[key] = time.monotonic()
+            return client
+
+    def _create(self, kind: str, api_key: str, base_url: str = None):
+        if kind == "async":
+            http_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                               max_retries=self.max_retries)
+        http_client = httpx.Client(limits=self.limits, timeout=self.timeout)
+        return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                      max_retries=self.max_retries)
+
+    def get(self, api_key: str, base_url: str = None) -> OpenAI:
+        """Shared sync client for this key and endpoint"""
+        return self._get("sync", api_key, base_url)
+
+    def get_async(self, api_key: str, base_url: str = None) -> AsyncOpenAI:
+        """Shared async client for this key and endpoint"""
+        return self._get("async", api_key, base_url)
+
+    def is_warm(self, api_key: str, base_url: str = None) -> bool:
+        """Whether the sync client was used recently enough to still hold open connections"""
+        last = self._last_used.get(("sync", api_key, base_url))
+        return last is not None and time.monotonic() - last < self.keepalive_expiry
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "created": self.created,
+            "reused": self.reused,
+        }
+
+    def close(self):
+        """Close sync clients; async clients should be closed from their own loop"""
+        with self._lock:
+            for (kind, _, _), client in list(self._clients.items()):
+                if kind == "sync":
+                    client.close()
+            self._clients.clear()
+            self._last_used.clear()
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> ClientPool:
+    """The process-wide pool, created on first use"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ClientPool()
+        return _default_pool
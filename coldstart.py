@@ -0,0 +1,134 @@
+"""
+Cold-start benchmark - import and first-reply time of a fresh interpreter, as a serverless function sees it
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmark import summarize
+from mock_server import MockLLMServer
+
+# Runs in a fresh interpreter per sample: argv is the scenario and the mock's base URL
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import autoresponder
+timings = {"import": time.perf_counter() - started}
+scenario, base_url = sys.argv[1], sys.argv[2]
+if scenario != "import":
+    from fastpath import FastPathClassifier
+    before = time.perf_counter()
+    responder = autoresponder.Autoresponder(
+        "mock", base_url=base_url, fast_path=FastPathClassifier(),
+        transport="urllib" if scenario == "first_call_urllib" else "openai",
+    )
+    ready = time.perf_counter()
+    responder.process("Not interested, please remove me." if scenario == "fast_path" else
+                      "Could you send over a case study from a logistics company?")
+    timings.update(construct=ready - before, first_reply=time.perf_counter() - ready)
+timings["total"] = time.perf_counter() - started
+timings["sdk_loaded"] = "openai" in sys.modules
+print(json.dumps(timings))
+"""
+
+# import: module load only; fast_path: a HARD_NO answered without a model call;
+# first_call_*: one model-backed reply through each transport
+SCENARIOS = ("import", "fast_path", "first_call_openai", "first_call_urllib")
+
+
+def sample(scenario: str, base_url: str) -> dict:
+    """One fresh-process run; `process` is wall time including interpreter startup"""
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD, scenario, base_url],
+                         capture_output=True, text=True, check=True)
+    timings = json.loads(out.stdout.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - started
+    return timings
+
+
+def import_breakdown(top: int = 10) -> list:
+    """Slowest modules imported directly by autoresponder, from python -X importtime"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import autoresponder"],
+                         capture_output=True, text=True, check=True)
+    rows, children = [], []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Children are listed before their parent, one level (two spaces) deeper
+        depth = len(name) - len(name.lstrip())
+        if depth == 1:
+            if name.strip() == "autoresponder":
+                rows = children
+            children = []
+        elif depth == 3:
+            children.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(rows, key=lambda row: -row[1])[:top]
+
+
+def bench(scenario: str, runs: int, base_url: str) -> dict:
+    samples = [sample(scenario, base_url) for _ in range(runs)]
+    row = {"scenario": scenario, "runs": runs, "sdk_loaded": any(s["sdk_loaded"] for s in samples)}
+    for stage in ("import", "construct", "first_reply", "total", "process"):
+        values = [s[stage] for s in samples if stage in s]
+        if values:
+            row[stage] = summarize(values)
+    return row
+
+
+def print_row(row: dict):
+    fmt = lambda stage: f"{row[stage]['p50'] * 1000:7.1f}" if stage in row else "      -"
+    print(f"{row['scenario']:>18}  import {fmt('import')}  first reply {fmt('first_reply')}"
+          f"  in-process {fmt('total')}  with startup {fmt('process')} ms (p50)"
+          f"  sdk {'loaded' if row['sdk_loaded'] else 'not loaded'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the autoresponder in fresh processes")
+    parser.add_argument("--runs", type=int, default=10, help="fresh processes per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--latency", default="fixed:0.05", help="mock latency distribution")
+    parser.add_argument("--breakdown", type=int, default=10, help="slowest direct imports to report")
+    parser.add_argument("--output", default="coldstart_results.json", help="machine-readable results file")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f"unknown scenario {scenario!r}")
+
+    mock = MockLLMServer(args.latency)
+    base_url = f"http://127.0.0.1:{mock.start_in_thread()}/v1"
+    rows = []
+    try:
+        for scenario in scenarios:
+            row = bench(scenario, args.runs, base_url)
+            print_row(row)
+            rows.append(row)
+    finally:
+        mock.stop_thread()
+
+    breakdown = import_breakdown(args.breakdown)
+    for name, seconds in breakdown:
+        print(f"{name:>24} {seconds * 1000:7.1f} ms")
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "runs": rows,
+        "imports": [{"module": name, "seconds": seconds} for name, seconds in breakdown],
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Latency budgets - per-call deadlines and hedged duplicate requests for the slow tail
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+
+# Monotonic time the current pipeline run must finish by, if it has a budget
+DEADLINE = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """A model call could not finish inside the latency budget
+
+    classification is set when the reply was classified before the budget ran out.
+    """
+    classification = None
+
+
+def remaining():
+    """Seconds left in the current budget, or None without one"""
+    deadline = DEADLINE.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class Hedger:
+    """Tracks recent latency per stage and decides when to send a duplicate request
+
+    A call still running after the `percentile` latency of its stage gets one
+    hedge; whichever answers first wins. `max_rate` caps hedges as a fraction
+    of calls so a provider-wide slowdown doesn't double the load.
+    """
+
+    def __init__(self, percentile: float = 95, window: int = 500, min_samples: int = 20, max_rate: float = 0.1):
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def quantile(self, stage: str, percentile: float):
+        """Recent latency at `percentile` for a stage, or None until enough samples"""
+        with self._lock:
+            samples = sorted(self._latencies.get(stage, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def delay(self, stage: str):
+        """Seconds to wait before hedging a call, or None if it shouldn't be hedged"""
+        with self._lock:
+            self.calls += 1
+            if self.hedges >= self.max_rate * self.calls:
+                return None
+        return self.quantile(stage, self.percentile)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def hedged(self):
+        with self._lock:
+            self.hedges += 1
+
+    def won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> dict:
+        thresholds = {stage: self.quantile(stage, self.percentile) for stage in list(self._latencies)}
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            "thresholds": thresholds,
+        }
@@ -0,0 +1,167 @@
+"""
+Fast-path classifier - answers obvious replies locally, without an LLM call
+"""
+import json
+import re
+from collections import Counter
+
+from prompts import CLASSIFIER_PROMPT
+
+CATEGORIES = ("STRONG_POSITIVE", "SOFT_POSITIVE", "NEUTRAL", "SOFT_OBJECTION", "HARD_NO")
+
+# Explicit opt-outs are answered locally only when they stand alone: every clause is an opt-out or a pleasantry
+OPT_OUT_PHRASES = [
+    "remove me",
+    "unsubscribe",
+    "stop emailing me",
+    "stop contacting me",
+    "do not contact me",
+    "don't contact me",
+    "take me off your list",
+]
+
+# Anywhere before an opt-out in its clause ("I'm not going to unsubscribe"), these can reverse it
+NEGATION = re.compile(r"(?:^| )(?:don't|dont|do not|not|never|no need to|won't|wont|isn't|no) ")
+
+# The lead wants someone else in the conversation, not out of it ("remove me from the CC and add my colleague")
+REDIRECT = re.compile(r"(?:^| )(?:add|cc|bcc|forward (?:this|it|to|my)|instead|colleague|loop in|reach out to|email my|contact my)(?: |$)")
+
+# Clause boundaries in the raw message
+CLAUSE = re.compile(r"[.!?;,:\n]+|\s+-+\s+|\s+(?:and|but|so|or)\s+", re.I)
+
+# Pleasantries that don't change intent, stripped from both ends before matching
+FILLER = r"(?:hi|hey|hello|thanks|thank you|thx|please|pls|cheers|yes|yeah|yep|great)"
+
+
+def phrases_from_prompt(prompt: str = CLASSIFIER_PROMPT) -> dict:
+    """Extract the example phrases listed under each category definition"""
+    phrases = {category: [] for category in CATEGORIES}
+    current = None
+    for line in prompt.splitlines():
+        heading = re.match(r"^([A-Z_]+) - ", line)
+        if heading:
+            current = heading.group(1) if heading.group(1) in phrases else None
+        elif line.isupper():
+            current = None
+        elif current and line.startswith("- "):
+            phrases[current].extend(re.findall(r'"([^"]+)"', line))
+    return phrases
+
+
+def normalize(message: str) -> str:
+    """Lowercase, unify apostrophes and reduce the message to words"""
+    text = message.lower().replace("’", "'")
+    text = re.sub(r"[^\w' ]+", " ", text)
+    return " ".join(text.split())
+
+
+class FastPathClassifier:
+    """Precompiled phrase matcher placed in front of the LLM classifier"""
+
+    def __init__(self, extra_phrases: dict = None, opt_outs: list = None, seed_from_prompt: bool = True):
+        phrases = phrases_from_prompt() if seed_from_prompt else {c: [] for c in CATEGORIES}
+        for category, items in (extra_phrases or {}).items():
+            if category not in phrases:
+                raise ValueError(f"Unknown category {category!r}")
+            phrases[category].extend(items)
+
+        self.phrases = {c: sorted({normalize(p) for p in items if normalize(p)}) for c, items in phrases.items()}
+        self.opt_outs = [normalize(p) for p in (OPT_OUT_PHRASES if opt_outs is None else opt_outs)]
+        self._whole = self._compile_whole(self.phrases)
+        self._opt_out = self._compile_anywhere(self.opt_outs)
+        self._interest = self._compile_anywhere(self.phrases["STRONG_POSITIVE"] + self.phrases["SOFT_POSITIVE"])
+        self._filler = re.compile(rf"^{FILLER}(?: {FILLER})*$")
+
+        self.hits = Counter()
+        self.misses = 0
+
+    @classmethod
+    def from_json(cls, path: str) -> "FastPathClassifier":
+        """Build from a JSON config: {"phrases": {CATEGORY: [...]}, "opt_outs": [...]}"""
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(
+            extra_phrases=config.get("phrases"),
+            opt_outs=config.get("opt_outs"),
+            seed_from_prompt=config.get("seed_from_prompt", True),
+        )
+
+    @staticmethod
+    def _alternation(items: list) -> str:
+        # Longest first so the regex engine prefers the most specific phrase
+        return "|".join(re.escape(p) for p in sorted(items, key=len, reverse=True))
+
+    def _compile_whole(self, phrases: dict):
+        """One anchored pattern; the whole reply must be phrases of a single category"""
+        groups = []
+        for category, items in phrases.items():
+            if not items:
+                continue
+            alt = self._alternation(items)
+            groups.append(f"(?P<{category}>(?:{alt})(?: (?:and |but )?(?:{alt}))*)")
+        if not groups:
+            return None
+        return re.compile(rf"^(?:{FILLER} )*(?:{'|'.join(groups)})(?: {FILLER})*$")
+
+    def _compile_anywhere(self, items: list):
+        if not items:
+            return None
+        return re.compile(rf"(?:^| )(?:{self._alternation(items)})(?: |$)")
+
+    def _opted_out(self, message: str, text: str):
+        """True for a standalone opt-out, False for none, None when the reply says more than that"""
+        if not self._opt_out.search(text):
+            return False
+        if REDIRECT.search(text) or (self._interest is not None and self._interest.search(text)):
+            return None
+        for clause in filter(None, (normalize(part) for part in CLAUSE.split(message))):
+            found = self._opt_out.search(clause)
+            if found is not None:
+                if NEGATION.search(clause[:found.start() + 1]):
+                    return None
+            elif not self._filler.match(clause) and self._whole_category(clause) != "HARD_NO":
+                # Another clause with its own content ("tell me more"): the model should read it
+                return None
+        return True
+
+    def _whole_category(self, text: str):
+        m = self._whole.match(text) if self._whole is not None else None
+        return m.lastgroup if m else None
+
+    def match(self, message: str):
+        """Return the matched category, or None"""
+        text = normalize(message)
+        if not text:
+            return None
+        if self._opt_out is not None:
+            opted_out = self._opted_out(message, text)
+            if opted_out is None:
+                # Mixed signals: leave it to the LLM
+                return None
+            if opted_out:
+                return "HARD_NO"
+        return self._whole_category(text)
+
+    def classify(self, message: str):
+        """Classification dict for a confident match, or None to defer to the LLM"""
+        category = self.match(message)
+        if category is None:
+            self.misses += 1
+            return None
+        self.hits[category] += 1
+        return {
+            "category": category,
+            "confidence": "high",
+            "manual_required": False,
+        }
+
+    def stats(self) -> dict:
+        """How often the fast path answered instead of the LLM"""
+        hits = sum(self.hits.values())
+        total = hits + self.misses
+        return {
+            "hits": hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "by_category": dict(self.hits),
+        }
@@ -0,0 +1,65 @@
+"""
+Minimal HTTP/1.1 framing over asyncio streams, shared by the service and the mock LLM
+"""
+import json
+
+MAX_BODY = 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class PayloadTooLarge(ValueError):
+    pass
+
+
+async def read_request(reader):
+    """Read one request; returns (method, path, headers, body) or None on a closed connection
+
+    Raises ValueError for malformed requests and PayloadTooLarge past MAX_BODY.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise PayloadTooLarge("payload too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?")[0], headers, body
+
+
+def response_head(status: int, headers: dict, keep_alive: bool = False) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def json_response(status: int, body, headers: dict = None, keep_alive: bool = False) -> bytes:
+    """Serialize a complete JSON response"""
+    data = json.dumps(body).encode("utf-8")
+    head = {"Content-Type": "application/json", "Content-Length": str(len(data)), **(headers or {})}
+    return response_head(status, head, keep_alive) + data
+
+
+def text_response(status: int, text: str, content_type: str = "text/plain; charset=utf-8") -> bytes:
+    data = text.encode("utf-8")
+    head = {"Content-Type": content_type, "Content-Length": str(len(data))}
+    return response_head(status, head) + data
@@ -0,0 +1,236 @@
+"""
+Lite client - chat completions over the standard library, for cold starts where importing the OpenAI SDK dominates
+"""
+import asyncio
+import copy
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+class Record(dict):
+    """Decoded JSON object with attribute access; absent fields read as None"""
+
+    def __getattr__(self, name):
+        return self.get(name)
+
+
+def _load(data: bytes) -> Record:
+    return json.loads(data, object_hook=Record)
+
+
+class APIStatusError(Exception):
+    """Non-2xx answer; exposes status_code and response.headers like the SDK's errors"""
+
+    def __init__(self, status_code: int, message: str, headers):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        self.response = Record(status_code=status_code, headers=headers)
+
+
+class APIConnectionError(Exception):
+    """The request never got an HTTP answer"""
+
+
+class APITimeoutError(APIConnectionError):
+    """The request took longer than its timeout"""
+
+
+class _Response:
+    """Headers plus a parse() for the body, the shape of the SDK's with_raw_response"""
+
+    def __init__(self, headers, body):
+        self.headers = headers
+        self._body = body
+
+    def parse(self):
+        return self._body
+
+
+class _Completions:
+    def __init__(self, client: "LiteClient", raw: bool = False):
+        self._client = client
+        self._raw = raw
+        if not raw:
+            self.with_raw_response = type(self)(client, raw=True)
+
+    def create(self, **kwargs):
+        response = self._client._request(kwargs)
+        return response if self._raw else response.parse()
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, **kwargs):
+        response = await asyncio.to_thread(self._client._request, kwargs)
+        if kwargs.get("stream"):
+            response = _Response(response.headers, _aiterate(response.parse()))
+        return response if self._raw else response.parse()
+
+
+async def _aiterate(events):
+    done = object()
+    while True:
+        event = await asyncio.to_thread(next, events, done)
+        if event is done:
+            return
+        yield event
+
+
+class _Chat:
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class LiteClient:
+    """Stand-in for OpenAI() covering chat.completions.create and its with_raw_response
+
+    Responses are Records rather than pydantic models, so code must read them
+    with attribute access only. Each thread keeps one keep-alive connection;
+    streams get their own. Retries mirror the SDK: `max_retries` more attempts
+    on 429, 5xx and connection errors, honouring Retry-After.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = 60.0, max_retries: int = 2):
+        url = urlsplit(base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_BASE_URL)
+        self._connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._host = url.netloc
+        self._path = url.path.rstrip("/") + "/chat/completions"
+        self._headers = {
+            "Authorization": f"Bearer {api_key or os.environ.get('OPENAI_API_KEY', '')}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.chat = _Chat(self._completions())
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _completions(self):
+        return _Completions(self)
+
+    def with_options(self, max_retries: int = None, timeout: float = None) -> "LiteClient":
+        """Copy with other defaults that shares this client's connections, like the SDK's with_options"""
+        clone = copy.copy(self)
+        if max_retries is not None:
+            clone.max_retries = max_retries
+        if timeout is not None:
+            clone.timeout = timeout
+        clone.chat = _Chat(clone._completions())
+        return clone
+
+    def _connect(self, timeout: float):
+        connection = self._connection_class(self._host, timeout=timeout)
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+    def _drop(self, connection):
+        connection.close()
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        if getattr(self._local, "connection", None) is connection:
+            self._local.connection = None
+
+    def _request(self, kwargs: dict) -> _Response:
+        kwargs = dict(kwargs)
+        timeout = kwargs.pop("timeout", None) or self.timeout
+        body = json.dumps(kwargs).encode("utf-8")
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._send(body, timeout, bool(kwargs.get("stream")))
+            except (APIStatusError, APIConnectionError) as e:
+                status = getattr(e, "status_code", None)
+                if attempt == self.max_retries or (status is not None and status != 429 and status < 500):
+                    raise
+                time.sleep(self._backoff(attempt, e))
+
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        try:
+            return min(60.0, float(headers.get("retry-after")))
+        except (AttributeError, TypeError, ValueError):
+            return min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.75, 1.0)
+
+    def _send(self, body: bytes, timeout: float, stream: bool) -> _Response:
+        reused = not stream and getattr(self._local, "connection", None) is not None
+        connection = self._connect(timeout) if stream or not reused else self._local.connection
+        if not stream:
+            self._local.connection = connection
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        try:
+            connection.request("POST", self._path, body, self._headers)
+            response = connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+            self._drop(connection)
+            if reused:
+                # The server closed an idle keep-alive connection; one fresh try is not a retry
+                return self._send(body, timeout, stream)
+            raise APIConnectionError(str(e)) from e
+        except TimeoutError as e:
+            self._drop(connection)
+            raise APITimeoutError(str(e)) from e
+        except (OSError, http.client.HTTPException) as e:
+            self._drop(connection)
+            raise APIConnectionError(str(e)) from e
+
+        if response.status >= 400:
+            data = response.read()
+            try:
+                message = _load(data).error.message
+            except (ValueError, AttributeError):
+                message = data[:200].decode("utf-8", "replace")
+            if response.will_close:
+                self._drop(connection)
+            raise APIStatusError(response.status, message, response.headers)
+        if stream:
+            return _Response(response.headers, self._events(connection, response))
+        try:
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._drop(connection)
+            raise APIConnectionError(str(e)) from e
+        if response.will_close:
+            self._drop(connection)
+        return _Response(response.headers, _load(data))
+
+    def _events(self, connection, response):
+        """Server-sent chunks until [DONE]"""
+        try:
+            for line in response:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    return
+                yield _load(data)
+        finally:
+            self._drop(connection)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+
+class AsyncLiteClient(LiteClient):
+    """LiteClient for AsyncAutoresponder; each request runs in the default executor"""
+
+    def _completions(self):
+        return _AsyncCompletions(self)
+
+    async def close(self):
+        LiteClient.close(self)
@@ -0,0 +1,163 @@
+"""
+Instrumentation - stage timings, token usage and pipeline counters with Prometheus export
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+
+PREFIX = "autoresponder"
+
+# Seconds; LLM stages live in the 0.3s-20s range, local stages well under 1ms
+DEFAULT_BUCKETS = (0.0005, 0.005, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 60.0)
+
+# Shared no-op returned by the pipeline when metrics are disabled
+NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "started")
+
+    def __init__(self, metrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """In-process collector; pass one to Autoresponder(metrics=...)"""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS, window: int = 2048):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms = {}  # stage -> [bucket counts, sum, count]
+        self._recent = defaultdict(lambda: deque(maxlen=window))
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._sources = {}
+
+    # Recording
+
+    def span(self, stage: str):
+        """Context manager timing one stage"""
+        return _Span(self, stage)
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            self._recent[stage].append(seconds)
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += amount
+
+    def record_usage(self, stage: str, usage):
+        """Token usage from a completion response"""
+        if usage is None:
+            return
+        self.increment("tokens", getattr(usage, "prompt_tokens", 0) or 0, stage=stage, kind="prompt")
+        self.increment("tokens", getattr(usage, "completion_tokens", 0) or 0, stage=stage, kind="completion")
+
+    def add_source(self, name: str, stats):
+        """Export the numeric values of a component's stats() callable as gauges"""
+        self._sources[name] = stats
+
+    # Export
+
+    def _quantile(self, values: list, q: float):
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        """Per-stage latency quantiles over the recent window plus all counters"""
+        with self._lock:
+            stages = {}
+            for stage, (_, total, count) in self._histograms.items():
+                recent = list(self._recent[stage])
+                stages[stage] = {
+                    "count": count,
+                    "mean": total / count,
+                    "p50": self._quantile(recent, 0.50),
+                    "p95": self._quantile(recent, 0.95),
+                    "p99": self._quantile(recent, 0.99),
+                }
+            counters = defaultdict(dict)
+            for (name, labels), value in self._counters.items():
+                label = ",".join(f"{k}={v}" for k, v in labels) or "total"
+                counters[name][label] = value
+        return {
+            "stages": stages,
+            "counters": dict(counters),
+            "sources": {name: stats() for name, stats in self._sources.items()},
+        }
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            name = f"{PREFIX}_stage_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, (counts, total, count) in sorted(self._histograms.items()):
+                for bound, value in zip(self.buckets, counts):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {value}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+            seen = set()
+            for (counter, labels), value in sorted(self._counters.items()):
+                full = f"{PREFIX}_{counter}_total"
+                if full not in seen:
+                    lines.append(f"# TYPE {full} counter")
+                    seen.add(full)
+                rendered = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{full}{{{rendered}}} {value:g}" if rendered else f"{full} {value:g}")
+
+        for source, stats in sorted(self._sources.items()):
+            for key, value in sorted(stats().items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                full = f"{PREFIX}_{source}_{key}"
+                lines.append(f"# TYPE {full} gauge")
+                lines.append(f"{full} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9100):
+        """Serve /metrics from a daemon thread; returns the ThreadingHTTPServer"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
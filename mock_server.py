@@ -0,0 +1,323 @@
+"""
+Mock LLM server - a local OpenAI-compatible stub for benchmarks and end-to-end runs
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+from fastpath import FastPathClassifier
+from httpio import PayloadTooLarge, json_response, read_request, response_head
+from prompts import (
+    CLASSIFIER_CODES,
+    STRONG_POSITIVE_EXAMPLES,
+    SOFT_POSITIVE_EXAMPLES,
+    NEUTRAL_EXAMPLES,
+    REPLY_REWRITE,
+    SOFT_OBJECTION_EXAMPLES,
+)
+
+MOCK_CALENDAR_LINK = "https://cal.com/mock"
+
+# Canned replies per category, taken from the few-shot examples
+REPLIES = {
+    "STRONG_POSITIVE": [ex["content"].format(calendar_link=MOCK_CALENDAR_LINK) for ex in STRONG_POSITIVE_EXAMPLES if ex["role"] == "assistant"],
+    "SOFT_POSITIVE": [ex["content"] for ex in SOFT_POSITIVE_EXAMPLES if ex["role"] == "assistant"],
+    "NEUTRAL": [ex["content"] for ex in NEUTRAL_EXAMPLES if ex["role"] == "assistant"],
+    "SOFT_OBJECTION": [ex["content"] for ex in SOFT_OBJECTION_EXAMPLES if ex["role"] == "assistant"],
+}
+
+CODES = {category: code for code, category in CLASSIFIER_CODES.items()}
+
+# Prepended to a reply to break the no-greeting and banned-word rules
+RULE_BREAK = "Hi there! Happy to help. "
+REWRITE_MARKER = REPLY_REWRITE.split("{")[0]
+
+
+class LatencyModel:
+    """Samples latencies from a spec such as 'fixed:0.5', 'uniform:0.2,1.5' or 'lognormal:0.6,0.4'
+
+    For lognormal the parameters are the median in seconds and sigma.
+    """
+
+    def __init__(self, spec: str = "lognormal:0.6,0.4", rng: random.Random = None):
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v]
+        if kind not in ("fixed", "uniform", "lognormal", "normal"):
+            raise ValueError(f"Unknown latency distribution {kind!r}")
+        self.kind = kind
+        self.values = values
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.values[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(self.values[0], self.values[1])
+        if self.kind == "normal":
+            return max(0.0, self.rng.gauss(self.values[0], self.values[1]))
+        median, sigma = self.values
+        return self.rng.lognormvariate(0, sigma) * median
+
+
+def _lead_reply(messages: list) -> str:
+    """The prospect's text, whichever prompt layout the request uses"""
+    if len(messages) >= 3 and _is_rewrite(messages):
+        messages = messages[:-2]
+    last = messages[-1]["content"] if messages else ""
+    if "Here is the lead's reply:" in last:
+        return last.split("Here is the lead's reply:")[1].split("Output ONLY")[0].strip().strip('"')
+    return last
+
+
+def _is_rewrite(messages: list) -> bool:
+    return bool(messages) and (messages[-1].get("content") or "").startswith(REWRITE_MARKER)
+
+
+class MockLLMServer:
+    """Answers /v1/chat/completions with canned classifications and replies"""
+
+    def __init__(
+        self,
+        latency: str = "lognormal:0.6,0.4",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        rpm_limit: int = 10000,
+        tpm_limit: int = 2000000,
+        chunk_delay: float = 0.01,
+        seed: int = None,
+        violation_rate: float = 0.0,
+    ):
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.chunk_delay = chunk_delay
+        self.violation_rate = violation_rate
+        self.classifier = FastPathClassifier()
+
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "streams": 0}
+        self._window = []
+        self._server = None
+        self._connections = {}  # handler task -> writer
+        self._loop = None
+        self._thread = None
+
+    # Lifecycle
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        # Keep-alive connections would otherwise outlive the listener
+        for writer in list(self._connections.values()):
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Run the server on its own event loop in a daemon thread; returns the port"""
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        result = {}
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            result["port"] = self._loop.run_until_complete(self.start(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return result["port"]
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    # Content
+
+    def _category(self, messages: list) -> str:
+        return self.classifier.match(_lead_reply(messages)) or "SOFT_POSITIVE"
+
+    def _content(self, body: dict) -> str:
+        messages = body.get("messages", [])
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        category = self._category(messages)
+        reply = self.rng.choice(REPLIES.get(category, REPLIES["NEUTRAL"]))
+        if self.violation_rate and not _is_rewrite(messages) and self.rng.random() < self.violation_rate:
+            reply = RULE_BREAK + reply
+        classification = {"category": category, "confidence": "high", "manual_required": False}
+        if '"response": ""' in prompt:
+            return json.dumps({**classification, "response": "" if category == "HARD_NO" else reply})
+        if "Output ONLY a category letter" in prompt:
+            return f"{CODES[category]} 0"
+        if "Output ONLY valid JSON" in prompt:
+            return json.dumps(classification, indent=2)
+        if (body.get("response_format") or {}).get("type") == "json_schema":
+            return json.dumps(classification)
+        return reply
+
+    def _logprobs(self, content: str) -> dict:
+        """Plausible logprobs for short outputs: a confident first token"""
+        tokens = content.split(" ")
+        return {"content": [
+            {"token": t if i == 0 else " " + t, "logprob": -0.02 if i == 0 else -0.001, "bytes": None, "top_logprobs": []}
+            for i, t in enumerate(tokens)
+        ]}
+
+    def _rate_headers(self, tokens: int) -> dict:
+        now = time.monotonic()
+        self._window = [(t, n) for t, n in self._window if now - t < 60]
+        self._window.append((now, tokens))
+        used_tokens = sum(n for _, n in self._window)
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm_limit),
+            "x-ratelimit-remaining-requests": str(max(0, self.rpm_limit - len(self._window))),
+            "x-ratelimit-limit-tokens": str(self.tpm_limit),
+            "x-ratelimit-remaining-tokens": str(max(0, self.tpm_limit - used_tokens)),
+        }
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except PayloadTooLarge:
+                    writer.write(json_response(413, {"error": {"message": "payload too large"}}))
+                    break
+                except (ValueError, asyncio.IncompleteReadError):
+                    writer.write(json_response(400, {"error": {"message": "malformed request"}}))
+                    break
+                if request is None:
+                    break
+                keep_alive = await self._respond(writer, *request)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _respond(self, writer, method: str, path: str, headers: dict, raw: bytes) -> bool:
+        """Write one response; returns whether the connection can be reused"""
+        keep_alive = headers.get("connection", "").lower() != "close"
+        if not path.endswith("/chat/completions") or method != "POST":
+            writer.write(json_response(404, {"error": {"message": "not found"}}, keep_alive=keep_alive))
+            return keep_alive
+
+        self.stats["requests"] += 1
+        body = json.loads(raw or b"{}")
+        messages = body.get("messages", [])
+        await asyncio.sleep(self.latency.sample())
+
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            writer.write(json_response(429, error, {"retry-after": "1"}, keep_alive))
+            return keep_alive
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats["errors"] += 1
+            error = {"error": {"message": "Injected server error", "type": "server_error"}}
+            writer.write(json_response(500, error, keep_alive=keep_alive))
+            return keep_alive
+
+        content = self._content(body)
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        completion_tokens = max(1, len(content) // 4)
+        rate_headers = self._rate_headers(prompt_tokens + completion_tokens)
+        base = {
+            "id": f"chatcmpl-mock-{self.stats['requests']}",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+        }
+
+        if body.get("stream"):
+            self.stats["streams"] += 1
+            await self._stream(writer, base, content, rate_headers)
+            return False
+
+        writer.write(json_response(200, {
+            **base,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "logprobs": self._logprobs(content) if body.get("logprobs") else None,
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }, rate_headers, keep_alive))
+        return keep_alive
+
+    async def _stream(self, writer, base: dict, content: str, headers: dict):
+        """Server-sent events, one word per chunk"""
+        writer.write(response_head(200, {"Content-Type": "text/event-stream", **headers}))
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": None,
+                }],
+            }
+            writer.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            await writer.drain()
+            await asyncio.sleep(self.chunk_delay)
+        done = {**base, "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        writer.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="lognormal:0.6,0.4",
+                        help="fixed:S, uniform:LO,HI, normal:MEAN,SD or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--violation-rate", type=float, default=0.0,
+                        help="fraction of generated replies that break the prompt's STRICT RULES")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.latency, args.error_rate, args.rate_limit_rate, seed=args.seed,
+                           violation_rate=args.violation_rate)
+
+    async def run():
+        port = await server.start(args.host, args.port)
+        print(f"Mock LLM listening on http://{args.host}:{port}/v1")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
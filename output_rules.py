@@ -0,0 +1,167 @@
+"""
+Output rules - each category prompt's STRICT RULES compiled into local checks on generated replies
+"""
+import re
+import threading
+from typing import NamedTuple
+
+from registry import CATEGORY_PROMPTS
+
+# Openers counted as greetings even when a prompt lists only a few with "etc."
+GREETINGS = ("hi", "hello", "hey", "dear", "thanks", "thank you", "hope you're well", "hope you are well",
+             "good morning", "good afternoon")
+
+URL = re.compile(r"https?://\S+|www\.\S+", re.I)
+SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)|\n+")
+WORD = re.compile(r"[A-Za-z0-9]+(?:['’-][A-Za-z0-9]+)*")
+
+
+class Violation(NamedTuple):
+    rule: str
+    detail: str
+
+
+class CategoryRules(NamedTuple):
+    """Limits parsed from one prompt; None means the prompt doesn't set that limit"""
+    max_sentences: int = None
+    max_words: int = None
+    max_questions: int = None
+    greeting: re.Pattern = None
+    banned: re.Pattern = None
+    calendar_links: int = 0  # exact number of calendar links a reply must carry
+
+
+def _alternation(phrases) -> str:
+    return "|".join(re.escape(p).replace("\\ ", r"\s+").replace("'", "['’]") for p in sorted(set(phrases), key=len, reverse=True))
+
+
+def rules_from_prompt(prompt: str) -> CategoryRules:
+    """Compile the bullet list under STRICT RULES: into checks"""
+    section = prompt.split("STRICT RULES:", 1)[1].split("\n\n", 1)[0] if "STRICT RULES:" in prompt else ""
+    limits = {}
+    greetings, banned = list(GREETINGS), []
+    for line in section.lower().splitlines():
+        line = line.strip().lstrip("- ")
+        quoted = re.findall(r'"([^"]+)"', line)
+        if m := re.match(r"max (\d+) sentences", line):
+            limits["max_sentences"] = int(m.group(1))
+        elif m := re.match(r"max (\d+) words", line):
+            limits["max_words"] = int(m.group(1))
+        elif "question" in line and ("at most one" in line or "multiple" in line):
+            limits["max_questions"] = 1
+        elif line.startswith("no greetings"):
+            greetings += [q.rstrip(".!, ") for q in quoted]
+        elif "calendar link is allowed" in line:
+            limits["calendar_links"] = 1
+        elif line.startswith("no ") and quoted:
+            banned += quoted
+    return CategoryRules(
+        greeting=re.compile(rf"^\W*({_alternation(greetings)})\b", re.I),
+        banned=re.compile(rf"\b({_alternation(banned)})\b", re.I) if banned else None,
+        **limits,
+    )
+
+
+def check(rules: CategoryRules, reply: str, calendar_link: str) -> list:
+    """Violations of `rules` in a reply; an empty list means it passes"""
+    violations = []
+    links = URL.findall(reply)
+    text = URL.sub(" ", reply)
+
+    calendar = sum(1 for link in links if link.rstrip(".,;)") == calendar_link)
+    if calendar != rules.calendar_links:
+        expected = "exactly one calendar link" if rules.calendar_links == 1 else "no calendar link"
+        violations.append(Violation("calendar_link", f"must contain {expected} ({calendar_link})"))
+    if len(links) > calendar:
+        violations.append(Violation("links", "must not contain links other than the calendar link"))
+
+    if rules.max_sentences is not None:
+        sentences = sum(1 for part in SENTENCE_END.split(text) if WORD.search(part))
+        if sentences > rules.max_sentences:
+            violations.append(Violation("sentences", f"has {sentences} sentences, max {rules.max_sentences}"))
+    if rules.max_words is not None:
+        words = len(WORD.findall(text))
+        if words > rules.max_words:
+            violations.append(Violation("words", f"has {words} words, max {rules.max_words}"))
+    if rules.max_questions is not None:
+        questions = text.count("?")
+        if questions > rules.max_questions:
+            violations.append(Violation("questions", f"asks {questions} questions, max {rules.max_questions}"))
+    if rules.greeting is not None and rules.greeting.search(text):
+        violations.append(Violation("greeting", "must not open with a greeting"))
+    if rules.banned is not None:
+        found = sorted({m.group(0).lower() for m in rules.banned.finditer(text)})
+        if found:
+            violations.append(Violation("banned_words", "must not use " + ", ".join(f'"{w}"' for w in found)))
+    return violations
+
+
+class OutputValidator:
+    """Per-category rules for generated replies, with violation counts and a regeneration budget
+
+    A reply that breaks a rule is re-requested at most `max_retries` times,
+    and only while regenerations stay under `budget` (a fraction of checked
+    replies), so a prompt or model regression can't multiply spend.
+    """
+
+    def __init__(self, prompts: dict = None, max_retries: int = 1, budget: float = 0.25):
+        prompts = prompts if prompts is not None else {c: prompt for c, (prompt, _) in CATEGORY_PROMPTS.items()}
+        self.rules = {category: rules_from_prompt(prompt) for category, prompt in prompts.items()}
+        self.max_retries = max_retries
+        self.budget = budget
+        self.checked = {}
+        self.violating = {}
+        self.by_rule = {}
+        self.retries = 0
+        self.repaired = 0
+        self.unrepaired = 0
+        self._lock = threading.Lock()
+
+    def check(self, category: str, reply: str, calendar_link: str) -> list:
+        """Violations without recording them; categories without rules always pass"""
+        rules = self.rules.get(category)
+        return check(rules, reply, calendar_link) if rules is not None else []
+
+    def review(self, category: str, reply: str, calendar_link: str) -> list:
+        """check() a first draft and count the result"""
+        violations = self.check(category, reply, calendar_link)
+        with self._lock:
+            self.checked[category] = self.checked.get(category, 0) + 1
+            if violations:
+                self.violating[category] = self.violating.get(category, 0) + 1
+            for violation in violations:
+                self.by_rule[violation.rule] = self.by_rule.get(violation.rule, 0) + 1
+        return violations
+
+    def allow_retry(self, attempts: int) -> bool:
+        """Whether a reply that has been regenerated `attempts` times may be regenerated again"""
+        with self._lock:
+            if attempts >= self.max_retries or self.retries >= self.budget * sum(self.checked.values()):
+                return False
+            self.retries += 1
+            return True
+
+    def settle(self, violations: list):
+        """Record how a reply that failed its first check ended up"""
+        with self._lock:
+            if violations:
+                self.unrepaired += 1
+            else:
+                self.repaired += 1
+
+    def stats(self) -> dict:
+        checked = sum(self.checked.values())
+        violating = sum(self.violating.values())
+        stats = {
+            "checked": checked,
+            "violations": violating,
+            "violation_rate": violating / checked if checked else 0.0,
+            "retries": self.retries,
+            "repaired": self.repaired,
+            "unrepaired": self.unrepaired,
+        }
+        for category, count in sorted(self.checked.items()):
+            stats[f"{category.lower()}_violation_rate"] = self.violating.get(category, 0) / count
+        for rule, count in sorted(self.by_rule.items()):
+            stats[f"{rule}_violations"] = count
+        return stats
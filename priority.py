@@ -0,0 +1,244 @@
+"""
+Priority dispatch - classify first, then generate in order of reply value and per-category deadline
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from deadline import DEADLINE, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Seconds from arrival each category's reply is due; hot leads get the 5-minute promise
+CATEGORY_SLAS = {
+    "STRONG_POSITIVE": 300,
+    "SOFT_POSITIVE": 900,
+    "NEUTRAL": 3600,
+    "SOFT_OBJECTION": 3600,
+    "HARD_NO": 3600,
+}
+
+# Lanes from most to least valuable. READY holds replies already decided at intake,
+# TRIAGE messages still waiting for a model classification.
+READY = "READY"
+TRIAGE = "TRIAGE"
+LANES = (READY, "STRONG_POSITIVE", TRIAGE, "SOFT_POSITIVE", "NEUTRAL", "SOFT_OBJECTION", "HARD_NO")
+
+
+class _Job:
+    __slots__ = ("job", "message", "stripped", "received", "due", "classification", "response", "budget")
+
+    def __init__(self, job: dict, message: str, stripped, received: float):
+        self.job = job
+        self.message = message
+        self.stripped = stripped
+        self.received = received
+        self.due = None
+        self.classification = None
+        self.response = None
+        self.budget = None  # seconds of model time left under the responder's deadline
+
+
+class PriorityDispatcher:
+    """Fixed pool of workers serving per-category FIFO lanes of an AsyncAutoresponder's work
+
+    Messages are classified on arrival when that needs no model call (fast
+    path, vector index, cache); the rest queue for classification in the
+    TRIAGE lane, newest first once it falls behind. Generation then queues
+    in its category's lane, due `slas[category]` seconds after arrival. Workers take the most valuable
+    lane head that can still make its deadline, except that a head about to
+    miss it (less than one service time of slack) goes first. Work already
+    past its deadline only runs when nothing else can still be on time, so
+    an overload sheds the least valuable replies rather than the hot leads.
+
+    The responder's `deadline` bounds the time a job spends on workers, across
+    classification and generation, as process() bounds one call: a job that
+    runs out gets the category's template, flagged for manual review. Fused
+    and speculative responders are rejected, since both stages run apart here.
+    """
+
+    def __init__(self, responder, on_result, workers: int = 8, slas: dict = None, triage_sla: float = 60.0,
+                 window: int = 1000):
+        if responder.mode != "two_stage" or responder.speculator is not None:
+            raise ValueError("Priority dispatch needs a two-stage responder without a speculator")
+        self.responder = responder
+        self.on_result = on_result
+        self.workers = workers
+        self.slas = {**CATEGORY_SLAS, **(slas or {})}
+        self.triage_sla = triage_sla
+        self.window = window
+
+        self._lanes = {lane: deque() for lane in LANES}
+        self._service = {}  # stage -> smoothed seconds per call
+        self._waits = {}  # category -> recent arrival-to-reply seconds
+        self._counts = {}  # category -> [completed, met]
+        self.failed = 0
+        self.pending = 0
+        self._ready = None
+        self._idle = None
+        self._tasks = []
+
+    def start(self):
+        self._ready = asyncio.Semaphore(0)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def join(self):
+        """Wait until every submitted job has been answered"""
+        await self._idle.wait()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def queued(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    # Intake
+
+    def submit(self, job: dict):
+        """Queue a job ({"message", "recipient", ...}); results go to `on_result(job, result)`"""
+        message, stripped = self.responder._prepare(job["message"])
+        item = _Job(job, message, stripped, time.monotonic())
+        item.budget = self.responder.deadline
+        self.pending += 1
+        self._idle.clear()
+        classification = self.responder._classify_fast(message)
+        if classification is None:
+            item.due = item.received + self.triage_sla
+            self._push(TRIAGE, item)
+        else:
+            self._route(item, classification)
+
+    def _route(self, item: _Job, classification: dict):
+        """Queue a classified job for generation, or as ready if its reply needs no model call"""
+        item.classification = classification
+        category = classification.get("category", "NEUTRAL")
+        item.due = item.received + self.slas.get(category, self.slas["NEUTRAL"])
+        if self.responder._response_messages(item.message, category) is None:
+            item.response = self.responder._fixed_response(category)
+        else:
+            item.response = self.responder._pooled(item.message, classification, item.job.get("recipient"))
+        self._push(READY if item.response is not None else category, item)
+
+    def _push(self, lane: str, item: _Job):
+        self._lanes[lane if lane in self._lanes else "NEUTRAL"].append(item)
+        self._ready.release()
+
+    # Ordering
+
+    def _stage(self, lane: str) -> str:
+        return "classify" if lane == TRIAGE else "generate"
+
+    def _head(self, lane: str, now: float) -> int:
+        """Index of the lane's next job: the oldest, except newest-first once triage falls behind"""
+        queue = self._lanes[lane]
+        if lane == TRIAGE and queue[0].due < now:
+            # The oldest are late for a hot lead whatever happens; a fresh one may still make it
+            return -1
+        return 0
+
+    def _pick(self) -> tuple:
+        """Pop the next (lane, job) to work on"""
+        now = time.monotonic()
+        best, best_key = None, None
+        for rank, lane in enumerate(LANES):
+            queue = self._lanes[lane]
+            if not queue:
+                continue
+            service = 0.0 if lane == READY else self._service.get(self._stage(lane), 0.0)
+            slack = queue[self._head(lane, now)].due - now - service
+            # A late classification may still be on time for its category, so triage is never shed
+            key = (slack < 0 and lane != TRIAGE, not 0 <= slack < service, rank)
+            if best_key is None or key < best_key:
+                best, best_key = lane, key
+        queue = self._lanes[best]
+        return best, queue.pop() if self._head(best, now) else queue.popleft()
+
+    # Workers
+
+    async def _worker(self):
+        while True:
+            await self._ready.acquire()
+            lane, item = self._pick()
+            try:
+                result = await self._run(lane, item)
+            except Exception as e:
+                logger.warning("Job %s failed: %s", item.job.get("id"), e)
+                self.failed += 1
+                result = {"error": str(e)}
+            if result is None:
+                continue
+            try:
+                await self._finish(item, result)
+            except Exception:
+                logger.exception("Job %s crashed", item.job.get("id"))
+
+    async def _run(self, lane: str, item: _Job):
+        """Result for the job, or None once it is classified and queued for generation"""
+        if lane == READY:
+            return self.responder._report(self.responder._result(item.classification, item.response), item.stripped)
+        started = time.monotonic()
+        token = DEADLINE.set(None if item.budget is None else started + item.budget)
+        try:
+            if lane == TRIAGE:
+                classification = await self.responder.classify(item.message)
+            else:
+                item.response = await self.responder.generate_response(item.message, lane)
+        except DeadlineExceeded:
+            result = self.responder._deadline_result(item.classification)
+            return self.responder._report(result, item.stripped)
+        finally:
+            DEADLINE.reset(token)
+            elapsed = time.monotonic() - started
+            if item.budget is not None:
+                item.budget -= elapsed
+        self._observe(self._stage(lane), elapsed)
+        if lane == TRIAGE:
+            self._route(item, classification)
+            return None
+        return self.responder._report(self.responder._result(item.classification, item.response), item.stripped)
+
+    def _observe(self, stage: str, seconds: float):
+        previous = self._service.get(stage)
+        self._service[stage] = seconds if previous is None else 0.9 * previous + 0.1 * seconds
+
+    async def _finish(self, item: _Job, result: dict):
+        waited = time.monotonic() - item.received
+        category = (item.classification or {}).get("category", TRIAGE)
+        met = "error" not in result and waited <= item.due - item.received
+        counts = self._counts.setdefault(category, [0, 0])
+        counts[0] += 1
+        counts[1] += met
+        self._waits.setdefault(category, deque(maxlen=self.window)).append(waited)
+        result["sla_met"] = met
+        try:
+            await self.on_result(item.job, result)
+        finally:
+            self.pending -= 1
+            if not self.pending:
+                self._idle.set()
+
+    def stats(self) -> dict:
+        completed = sum(done for done, _ in self._counts.values())
+        met = sum(met for _, met in self._counts.values())
+        stats = {
+            "queued": self.queued(),
+            "pending": self.pending,
+            "completed": completed,
+            "failed": self.failed,
+            "met_rate": met / completed if completed else 0.0,
+        }
+        for category, (done, on_time) in sorted(self._counts.items()):
+            waits = sorted(self._waits[category])
+            name = category.lower()
+            stats[f"{name}_completed"] = done
+            stats[f"{name}_met_rate"] = on_time / done
+            stats[f"{name}_wait_p95"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+        for lane, queue in self._lanes.items():
+            stats[f"{lane.lower()}_queued"] = len(queue)
+        return stats
@@ -272,3 +272,68 @@ SOFT_OBJECTION_EXAMPLES = [
 ]
 
 HARD_NO_RESPONSE = "Thank you for letting me know. Removing you from my list."
+
+FUSED_PROMPT = """You are handling a lead's reply to a cold outreach message.
+In ONE pass, categorize the reply and write the response for that category.
+The lead's reply is the user message.
+
+{context}
+
+{classifier}
+
+RESPONSE RULES BY CATEGORY:
+
+{category_rules}
+
+For HARD_NO, leave "response" empty.
+
+Output ONLY valid JSON:
+{{
+  "category": "",
+  "confidence": "",
+  "manual_required": false,
+  "response": ""
+}}
+"""
+
+CLASSIFIER_CODES = {
+    "A": "STRONG_POSITIVE",
+    "B": "SOFT_POSITIVE",
+    "C": "NEUTRAL",
+    "D": "SOFT_OBJECTION",
+    "E": "HARD_NO",
+}
+
+CLASSIFIER_CODE_OUTPUT = """The lead's reply is the user message.
+
+Output ONLY a category letter and a manual flag, separated by a space:
+- A = STRONG_POSITIVE, B = SOFT_POSITIVE, C = NEUTRAL, D = SOFT_OBJECTION, E = HARD_NO
+- 1 if manual_required, otherwise 0
+
+Example output:
+A 0
+"""
+
+CLASSIFIER_STRUCTURED_OUTPUT = """The lead's reply is the user message.
+
+Output the category, confidence and manual_required fields.
+"""
+
+THREAD_CONTEXT = """EARLIER IN THIS THREAD (oldest first; the lead's newest reply is the last message):
+{turns}
+
+Use this only as context. Do not repeat what was already said."""
+
+# Follow-up turn when a generated reply breaks a STRICT RULE; the broken reply is the turn before it
+REPLY_REWRITE = """Your reply broke these rules:
+{violations}
+
+Rewrite it so it follows every rule above. Output ONLY the new reply."""
+
+# Replies used when the latency budget runs out before generation; always sent for manual review
+FALLBACK_TEMPLATES = {
+    "STRONG_POSITIVE": "Good - quick 15-20 minutes to validate fit.\nYou can grab time here:\n{calendar_link}",
+    "SOFT_POSITIVE": "Easier to walk through live than over email.\nUsually 10-15 minutes is enough to see if there's overlap.\nOpen to a quick check?",
+    "NEUTRAL": "Fair question.\nI sit between teams and partners and only make introductions when timing is real.\nHappy to give quick context live if that helps.",
+    "SOFT_OBJECTION": "Makes sense.\nI usually only step in when timing starts to matter.\nHappy to reconnect if priorities shift.",
+}
@@ -0,0 +1,152 @@
+"""
+Prompt registry - per-tenant message prefixes compiled once and reused
+"""
+import hashlib
+import json
+import threading
+from typing import NamedTuple
+
+from prompts import (
+    CONTEXT,
+    CLASSIFIER_PROMPT,
+    STRONG_POSITIVE_PROMPT,
+    STRONG_POSITIVE_EXAMPLES,
+    SOFT_POSITIVE_PROMPT,
+    SOFT_POSITIVE_EXAMPLES,
+    NEUTRAL_PROMPT,
+    NEUTRAL_EXAMPLES,
+    SOFT_OBJECTION_PROMPT,
+    SOFT_OBJECTION_EXAMPLES,
+    FUSED_PROMPT,
+)
+
+DEFAULT_TENANT = "default"
+
+# Categories that get a generated reply; anything else uses a fixed response
+CATEGORY_PROMPTS = {
+    "STRONG_POSITIVE": (STRONG_POSITIVE_PROMPT, STRONG_POSITIVE_EXAMPLES),
+    "SOFT_POSITIVE": (SOFT_POSITIVE_PROMPT, SOFT_POSITIVE_EXAMPLES),
+    "NEUTRAL": (NEUTRAL_PROMPT, NEUTRAL_EXAMPLES),
+    "SOFT_OBJECTION": (SOFT_OBJECTION_PROMPT, SOFT_OBJECTION_EXAMPLES),
+}
+
+FUSED = "FUSED"
+
+
+class Tenant(NamedTuple):
+    """One client's prompt configuration; examples override the defaults per category"""
+    name: str
+    calendar_link: str = "https://cal.com/your-calendar"
+    context: str = CONTEXT
+    examples: dict = None
+
+    def fingerprint(self) -> str:
+        """Short hash of everything that shapes this tenant's prompts"""
+        blob = json.dumps([self.name, self.calendar_link, self.context, self.examples], sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:12]
+
+
+def _compile_category(tenant: Tenant, prompt: str, examples: list) -> tuple:
+    """System prompt plus formatted few-shot turns, as (role, content) pairs"""
+    system_prompt = prompt.format(
+        context=tenant.context,
+        calendar_link=tenant.calendar_link,
+        message="{message}"
+    )
+    prefix = [("system", system_prompt)]
+    for ex in examples:
+        prefix.append((ex["role"], ex["content"].format(calendar_link=tenant.calendar_link)))
+    return tuple(prefix)
+
+
+def _compile_fused(tenant: Tenant) -> tuple:
+    """Single system prompt holding the classifier and every category's rules"""
+    rules = []
+    for category, (prompt, default_examples) in CATEGORY_PROMPTS.items():
+        examples = (tenant.examples or {}).get(category, default_examples)
+        # Keep the rules and style guidelines, drop the per-prompt output section
+        body = prompt.split("OUTPUT:")[0].format(
+            context="",
+            calendar_link=tenant.calendar_link,
+        ).replace("\n\n\n\n", "\n\n").strip()
+        lines = [f"### {category}", body, "", "EXAMPLES:"]
+        for ex in examples:
+            label = "Lead" if ex["role"] == "user" else "Reply"
+            lines.append(f"{label}: {ex['content'].format(calendar_link=tenant.calendar_link)}")
+        rules.append("\n".join(lines))
+
+    classifier = CLASSIFIER_PROMPT.split("Here is the lead's reply:")[0].strip()
+    system_prompt = FUSED_PROMPT.format(
+        context=tenant.context,
+        classifier=classifier,
+        category_rules="\n\n".join(rules),
+    )
+    return (("system", system_prompt),)
+
+
+class PromptRegistry:
+    """Tenants and their compiled per-category prefixes
+
+    Prefixes are built on first use and never change afterwards, so every
+    request for a tenant/category starts with byte-identical messages and
+    provider-side prompt caching can reuse them.
+    """
+
+    def __init__(self, tenants: list = None):
+        self._tenants = {}
+        self._compiled = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        for tenant in tenants or []:
+            self.register(tenant)
+
+    def register(self, tenant: Tenant):
+        """Add or replace a tenant; its prefixes are recompiled on next use"""
+        with self._lock:
+            self._tenants[tenant.name] = tenant
+            self._fingerprints[tenant.name] = tenant.fingerprint()
+            for key in [k for k in self._compiled if k[0] == tenant.name]:
+                del self._compiled[key]
+
+    def tenant(self, name: str) -> Tenant:
+        try:
+            return self._tenants[name]
+        except KeyError:
+            raise KeyError(f"Unknown tenant {name!r}") from None
+
+    def fingerprint(self, name: str) -> str:
+        """Precomputed Tenant.fingerprint(), for cache keys"""
+        self.tenant(name)
+        return self._fingerprints[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tenants
+
+    def prefix(self, name: str, category: str):
+        """Compiled (role, content) prefix, or None if the category has no prompt"""
+        key = (name, category)
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled
+
+        tenant = self.tenant(name)
+        if category == FUSED:
+            compiled = _compile_fused(tenant)
+        elif category in CATEGORY_PROMPTS:
+            prompt, default_examples = CATEGORY_PROMPTS[category]
+            examples = (tenant.examples or {}).get(category, default_examples)
+            compiled = _compile_category(tenant, prompt, examples)
+        else:
+            return None
+
+        with self._lock:
+            return self._compiled.setdefault(key, compiled)
+
+    def messages(self, name: str, category: str, message: str):
+        """Request messages: the cached prefix followed by the prospect message"""
+        prefix = self.prefix(name, category)
+        if prefix is None:
+            return None
+        messages = [{"role": role, "content": content} for role, content in prefix]
+        messages.append({"role": "user", "content": message})
+        return messages
@@ -0,0 +1,210 @@
+"""
+Reply pool - pregenerated replies per tenant and category, served without a model call
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from autoresponder import Autoresponder
+from fastpath import normalize, phrases_from_prompt
+from registry import CATEGORY_PROMPTS
+
+logger = logging.getLogger(__name__)
+
+# Categories whose replies to short messages are interchangeable
+POOL_CATEGORIES = ("STRONG_POSITIVE", "NEUTRAL", "SOFT_OBJECTION")
+
+
+def seed_messages(category: str) -> list:
+    """Lead messages to generate pool replies for: the few-shot examples and the classifier's phrases"""
+    _, examples = CATEGORY_PROMPTS[category]
+    seeds = [ex["content"] for ex in examples if ex["role"] == "user"]
+    seeds += [phrase for phrase in phrases_from_prompt()[category] if phrase not in seeds]
+    return seeds
+
+
+class ReplyPool:
+    """SQLite-backed pool; each slot is a (tenant, tenant fingerprint, category) triple
+
+    Replies rotate round-robin within a slot, a recipient never gets the same
+    reply twice, and a reply is retired after `max_uses` so refills keep the
+    pool fresh. Changing a tenant's prompts changes its fingerprint, which
+    leaves the old slot behind.
+    """
+
+    def __init__(self, path: str = "reply_pool.db", size: int = 20, categories: tuple = POOL_CATEGORIES,
+                 max_words: int = 8, max_uses: int = 500):
+        self.size = size
+        self.categories = tuple(categories)
+        self.max_words = max_words
+        self.max_uses = max_uses
+        self.served = 0
+        self.misses = 0
+        self.retired = 0
+
+        self._slots = {}  # slot -> [(id, text, uses)]
+        self._cursors = {}
+        self._lock = threading.Lock()
+        self._refill = None
+        self._stop = threading.Event()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS replies ("
+            "id INTEGER PRIMARY KEY, tenant TEXT NOT NULL, fingerprint TEXT NOT NULL, category TEXT NOT NULL, "
+            "text TEXT NOT NULL, uses INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS replies_slot ON replies (tenant, fingerprint, category)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS served (recipient TEXT NOT NULL, reply INTEGER NOT NULL, "
+            "PRIMARY KEY (recipient, reply)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def _slot(self, slot: tuple) -> list:
+        rows = self._slots.get(slot)
+        if rows is None:
+            rows = self._slots[slot] = [list(row) for row in self._db.execute(
+                "SELECT id, text, uses FROM replies WHERE tenant = ? AND fingerprint = ? AND category = ? ORDER BY id",
+                slot,
+            )]
+        return rows
+
+    def serves(self, message: str, classification: dict) -> bool:
+        """Whether a confident classification of a short message can take a pooled reply"""
+        return (
+            classification.get("category") in self.categories
+            and not classification.get("manual_required")
+            and classification.get("confidence") != "low"
+            and len(normalize(message).split()) <= self.max_words
+        )
+
+    def take(self, tenant: str, fingerprint: str, category: str, recipient: str = None):
+        """Next reply in rotation that this recipient hasn't had, or None"""
+        slot = (tenant, fingerprint, category)
+        with self._lock:
+            rows = self._slot(slot)
+            start = self._cursors.get(slot, 0)
+            for offset in range(len(rows)):
+                row = rows[(start + offset) % len(rows)]
+                if recipient is not None and self._db.execute(
+                    "SELECT 1 FROM served WHERE recipient = ? AND reply = ?", (recipient, row[0])
+                ).fetchone():
+                    continue
+                self._cursors[slot] = (start + offset + 1) % len(rows)
+                self._use(rows, row, recipient)
+                self.served += 1
+                return row[1]
+            self.misses += 1
+            return None
+
+    def _use(self, rows: list, row: list, recipient: str):
+        row[2] += 1
+        if recipient is not None:
+            self._db.execute("INSERT OR IGNORE INTO served (recipient, reply) VALUES (?, ?)", (recipient, row[0]))
+        if row[2] >= self.max_uses:
+            rows.remove(row)
+            self._db.execute("DELETE FROM replies WHERE id = ?", (row[0],))
+            self.retired += 1
+        else:
+            self._db.execute("UPDATE replies SET uses = ? WHERE id = ?", (row[2], row[0]))
+        self._db.commit()
+
+    def add(self, tenant: str, fingerprint: str, category: str, text: str) -> bool:
+        """Store a reply unless the slot already has the same text"""
+        slot = (tenant, fingerprint, category)
+        with self._lock:
+            rows = self._slot(slot)
+            if any(normalize(existing) == normalize(text) for _, existing, _ in rows):
+                return False
+            cursor = self._db.execute(
+                "INSERT INTO replies (tenant, fingerprint, category, text, created) VALUES (?, ?, ?, ?, ?)",
+                (tenant, fingerprint, category, text, time.time()),
+            )
+            self._db.commit()
+            rows.append([cursor.lastrowid, text, 0])
+            return True
+
+    def count(self, tenant: str, fingerprint: str, category: str) -> int:
+        with self._lock:
+            return len(self._slot((tenant, fingerprint, category)))
+
+    def fill(self, responder, categories: tuple = None) -> int:
+        """Generate replies until each category holds `size` for the responder's tenant; returns how many were added
+
+        Use a synchronous Autoresponder without a response cache, or every seed yields the same reply.
+        """
+        tenant, fingerprint = responder.tenant, responder.registry.fingerprint(responder.tenant)
+        added = 0
+        for category in categories or self.categories:
+            seeds = seed_messages(category)
+            missing = self.size - self.count(tenant, fingerprint, category)
+            # Duplicates are dropped, so allow a few extra attempts before giving up on a slot
+            for attempt in range(max(0, missing) * 3):
+                if self.count(tenant, fingerprint, category) >= self.size:
+                    break
+                reply = responder.generate_response(seeds[attempt % len(seeds)], category)
+                if reply and self.add(tenant, fingerprint, category, reply.strip()):
+                    added += 1
+        return added
+
+    def start_refill(self, responder, interval: float = 600.0):
+        """Top the pool up for the responder's tenant now and every `interval` seconds, in a daemon thread"""
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    added = self.fill(responder)
+                    if added:
+                        logger.info("Reply pool refilled with %d replies", added)
+                except Exception:
+                    logger.exception("Reply pool refill failed")
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._refill = threading.Thread(target=loop, name="reply-pool-refill", daemon=True)
+        self._refill.start()
+
+    def stop_refill(self):
+        self._stop.set()
+        if self._refill is not None:
+            self._refill.join()
+            self._refill = None
+
+    def stats(self) -> dict:
+        total = self.served + self.misses
+        return {
+            "served": self.served,
+            "misses": self.misses,
+            "hit_rate": self.served / total if total else 0.0,
+            "retired": self.retired,
+            "replies": sum(len(rows) for rows in self._slots.values()),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pregenerate pooled replies for generic categories")
+    parser.add_argument("path", help="pool database file")
+    parser.add_argument("--size", type=int, default=20, help="replies per category")
+    parser.add_argument("--categories", default=",".join(POOL_CATEGORIES))
+    parser.add_argument("--calendar-link", default="https://cal.com/your-calendar")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint, e.g. a local mock")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    responder = Autoresponder(api_key=os.environ.get("OPENAI_API_KEY", ""), calendar_link=args.calendar_link,
+                              base_url=args.base_url)
+    pool = ReplyPool(args.path, size=args.size)
+    categories = tuple(c for c in args.categories.split(",") if c)
+    added = pool.fill(responder, categories)
+    print(f"Added {added} replies to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Reply extraction - keep only the new text of an email body, dropping quotes, signatures and disclaimers
+"""
+import argparse
+import re
+import threading
+from html.parser import HTMLParser
+from typing import NamedTuple
+
+from scheduler import CHARS_PER_TOKEN
+
+# "On Mon, 3 Jun 2024 at 10:02, Sam <sam@x.com> wrote:" and its translations
+ATTRIBUTION = re.compile(r"^(on|le|am|el|il)\s.{0,300}\b(wrote|a écrit|schrieb|escribió|ha scritto)\s*:$", re.I)
+
+# Everything from one of these lines onwards is quoted history
+QUOTE_START = re.compile(
+    r"^(>|-{2,}\s*(original message|forwarded message)\s*-{2,}|_{10,}$|begin forwarded message:)",
+    re.I,
+)
+
+# Outlook header block: a From: line followed by one of these
+HEADER = re.compile(r"^(sent|date|to|subject):\s", re.I)
+
+# Signatures, client footers and legal boilerplate end the reply
+SIGNATURE = re.compile(
+    r"^(--\s*$|sent from my\b|sent from (outlook|mail|yahoo)\b|get outlook for\b|"
+    r"confidentiality notice|disclaimer:|"
+    # "This email ..." only as legal boilerplate, so a reply that starts that way is kept
+    r"this (e-?mail|message)( and any (attachments|files))?( (is|are|may|contains|transmitted)\b)"
+    r"(?=.*\b(confidential|privileged|intended (only )?for|intended recipient)))",
+    re.I,
+)
+
+VALEDICTION = re.compile(
+    r"^(thanks|thank you|many thanks|best|best regards|regards|kind regards|warm regards|cheers|"
+    r"sincerely|all the best|talk soon)[,.!]?$",
+    re.I,
+)
+# Lines allowed after a valediction for it to count as a sign-off (name, title, company, phone)
+SIGN_OFF_LINES = 5
+SIGN_OFF_LINE_CHARS = 60
+# Marks a line as prose rather than a name, title or phone number
+SENTENCE = re.compile(r"[?!]|\.\s+\S|^(\S+\s+){4,}\S+\.$")
+
+BLOCK_TAGS = {"br", "p", "div", "tr", "li", "ul", "ol", "table", "h1", "h2", "h3", "h4", "h5", "h6"}
+SKIP_TAGS = {"style", "script", "head", "title"}
+# Containers mail clients put quoted history and forwarded headers in
+QUOTE_MARKUP = re.compile(r"gmail_quote|yahoo_quoted|moz-cite-prefix|divRplyFwdMsg|appendonsend|OLK_SRC_BODY_SECTION")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+class _HTMLText(HTMLParser):
+    """Feeds visible text to a ReplyExtractor, cutting at the first quoted-history container"""
+
+    def __init__(self, extractor: "ReplyExtractor"):
+        super().__init__(convert_charrefs=True)
+        self.extractor = extractor
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        markers = f"{attrs.get('class') or ''} {attrs.get('id') or ''}"
+        if tag == "blockquote" or QUOTE_MARKUP.search(markers):
+            self.extractor.cut()
+        elif tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self.extractor.text("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in BLOCK_TAGS:
+            self.extractor.text("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.extractor.text(re.sub(r"\s+", " ", data))
+
+
+class ReplyExtractor:
+    """Incremental extractor: feed() chunks as they arrive, stop once `done`, then close()
+
+    Replies are assumed top-posted, so the first quote header, quoted line or
+    signature marker ends the new text and the rest of the body need not be read.
+    """
+
+    def __init__(self, html: bool = False):
+        self.html = html
+        self.done = False
+        self.chars_in = 0
+        self._lines = []
+        self._partial = ""
+        self._prev = ""
+        self._parser = _HTMLText(self) if html else None
+
+    def feed(self, chunk: str):
+        self.chars_in += len(chunk)
+        if self.done:
+            return
+        if self._parser is not None:
+            self._parser.feed(chunk)
+        else:
+            self.text(chunk)
+
+    def text(self, text: str):
+        """Append body text; complete lines are checked as soon as they end"""
+        if self.done:
+            return
+        self._partial += text
+        *complete, self._partial = self._partial.split("\n")
+        for line in complete:
+            self._line(line)
+            if self.done:
+                return
+
+    def cut(self):
+        """End the reply here"""
+        if not self.done and self._partial.strip():
+            self._line(self._partial)
+        self._partial = ""
+        self.done = True
+
+    def _line(self, line: str):
+        line = line.strip() if self.html else line.rstrip("\r ")
+        stripped = line.strip()
+        if ATTRIBUTION.match(stripped) or QUOTE_START.match(stripped) or SIGNATURE.match(stripped):
+            self.done = True
+            return
+        if self._prev and (ATTRIBUTION.match(f"{self._prev} {stripped}")
+                           or (self._prev.lower().startswith("from:") and HEADER.match(stripped))):
+            # The marker started on the previous line
+            self._lines.pop()
+            self.done = True
+            return
+        self._prev = stripped
+        self._lines.append(line)
+
+    def close(self) -> str:
+        """The extracted reply text"""
+        if not self.done:
+            if self._parser is not None:
+                self._parser.close()
+            if self._partial:
+                self._line(self._partial)
+                self._partial = ""
+        self.done = True
+
+        lines = self._lines
+        while lines and not lines[-1].strip():
+            lines.pop()
+        # Drop a trailing sign-off block ("Best,\nSam Lee\nVP Sales"), unless it is the whole reply
+        for i in range(len(lines) - 1, 0, -1):
+            if VALEDICTION.match(lines[i].strip()):
+                tail = [line for line in lines[i + 1:] if line.strip()]
+                if _sign_off(tail) and any(line.strip() for line in lines[:i]):
+                    lines = lines[:i]
+                break
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _sign_off(tail: list) -> bool:
+    """Whether the lines after a valediction look like a signature rather than more of the reply"""
+    return len(tail) <= SIGN_OFF_LINES and all(
+        len(line.strip()) <= SIGN_OFF_LINE_CHARS and not SENTENCE.search(line.strip()) for line in tail
+    )
+
+
+class Stripped(NamedTuple):
+    """Extracted reply text with the token estimate before and after"""
+    text: str
+    tokens_in: int
+    tokens_out: int
+
+    @property
+    def saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+
+def looks_like_html(body: str) -> bool:
+    return bool(re.search(r"<(html|body|div|p|br|span|table|blockquote)\b", body[:4096], re.I))
+
+
+def strip_reply(body: str, html: bool = None) -> Stripped:
+    """New reply text of an email body; the body itself if nothing would be left"""
+    if html is None:
+        html = looks_like_html(body)
+    extractor = ReplyExtractor(html)
+    extractor.feed(body)
+    text = extractor.close() or body.strip()
+    return Stripped(text, estimate_tokens(body), estimate_tokens(text))
+
+
+class EmailPreprocessor:
+    """strip_reply() with running totals; plugs into Autoresponder(preprocessor=...)"""
+
+    def __init__(self, html: bool = None):
+        self.html = html
+        self.messages = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, body: str) -> Stripped:
+        stripped = strip_reply(body, self.html)
+        with self._lock:
+            self.messages += 1
+            self.tokens_in += stripped.tokens_in
+            self.tokens_out += stripped.tokens_out
+        return stripped
+
+    def stats(self) -> dict:
+        return {
+            "messages": self.messages,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": self.tokens_in - self.tokens_out,
+            "saved_ratio": 1 - self.tokens_out / self.tokens_in if self.tokens_in else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract new reply text from email bodies and report tokens saved")
+    parser.add_argument("files", nargs="+", help="one email body per file, plain text or HTML")
+    parser.add_argument("--show", action="store_true", help="print the extracted text")
+    args = parser.parse_args()
+
+    preprocessor = EmailPreprocessor()
+    for path in args.files:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            stripped = preprocessor(f.read())
+        print(f"{path}: {stripped.tokens_in} -> {stripped.tokens_out} tokens ({stripped.saved} saved)")
+        if args.show:
+            print(stripped.text, end="\n\n")
+
+    stats = preprocessor.stats()
+    print(f"total: {stats['tokens_in']} -> {stats['tokens_out']} tokens ({stats['saved_ratio']:.0%} saved)")
+
+
+if __name__ == "__main__":
+    main()
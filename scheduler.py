@@ -0,0 +1,271 @@
+"""
+Request scheduler - rate limits, token budgeting, adaptive concurrency and retries
+"""
+import random
+import threading
+import time
+from collections import deque
+
+# Rough chars-per-token ratio for English prompts; good enough for budgeting
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4
+# Completion budget assumed when a call doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 100
+
+
+def estimate_tokens(messages: list, max_tokens: int = None) -> int:
+    """Estimate prompt plus completion tokens before the request is sent"""
+    prompt = sum(len(m.get("content") or "") // CHARS_PER_TOKEN + MESSAGE_OVERHEAD for m in messages)
+    return prompt + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute; reservations may run into debt"""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` now and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.level -= amount
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, amount: float):
+        """Give back an over-estimate (negative amounts charge the difference)"""
+        with self._lock:
+            self.level = min(self.capacity, self.level + amount)
+
+    def cap(self, remaining: float):
+        """Never believe we have more left than the provider says we do"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.level, remaining)
+
+
+def _status(exc: Exception):
+    return getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = _status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def _retry_after(exc: Exception):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class Scheduler:
+    """Every completion call goes through here
+
+    Requests and tokens are paced with token buckets, concurrency follows an
+    AIMD policy driven by 429s and the x-ratelimit-* response headers, and
+    retryable failures back off exponentially with full jitter.
+    """
+
+    def __init__(
+        self,
+        rpm: int = 500,
+        tpm: int = 30000,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        history: int = 1000,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.active = 0
+        self._cond = threading.Condition()
+        self._async_cond = None
+        self._bare = {}  # id(client) -> (client, copy with its own retries off)
+
+        self.records = deque(maxlen=history)
+        self.totals = {
+            "calls": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "estimated_tokens": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    # Pacing
+
+    def _admit(self, kwargs: dict) -> tuple:
+        """Charge the buckets for one call; returns (estimate, seconds to wait)"""
+        estimate = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimate))
+        return estimate, wait
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        hinted = _retry_after(exc)
+        if hinted is not None:
+            return min(hinted, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    # Adaptive concurrency
+
+    def _on_success(self, headers):
+        if headers is not None:
+            self._apply_headers(headers)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def _on_rate_limited(self):
+        self.totals["rate_limited"] += 1
+        self.limit = max(self.min_concurrency, self.limit / 2)
+
+    def _apply_headers(self, headers):
+        """Shrink concurrency as the provider's remaining quota runs low, grow it otherwise"""
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            self.tokens.cap(float(remaining_tokens))
+
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        limit = headers.get("x-ratelimit-limit-requests")
+        if remaining is not None:
+            self.requests.cap(float(remaining))
+            if limit and float(remaining) / float(limit) < 0.1:
+                self.limit = max(self.min_concurrency, self.limit * 0.75)
+                return
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def _record(self, estimate: int, response, attempts: int, started: float):
+        usage = getattr(response, "usage", None)
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        if prompt is not None:
+            actual = prompt + (completion or 0)
+            self.tokens.refund(estimate - actual)
+            self.totals["prompt_tokens"] += prompt
+            self.totals["completion_tokens"] += completion or 0
+        self.totals["calls"] += 1
+        self.totals["estimated_tokens"] += estimate
+        self.records.append({
+            "estimated_tokens": estimate,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "attempts": attempts,
+            "latency": time.perf_counter() - started,
+        })
+
+    # Calls
+
+    def _without_retries(self, client):
+        """The client with its own retries off, so every 429 reaches the schedule; one copy per client"""
+        entry = self._bare.get(id(client))
+        if entry is None or entry[0] is not client:
+            with_options = getattr(client, "with_options", None)
+            entry = (client, with_options(max_retries=0) if with_options is not None else client)
+            self._bare[id(client)] = entry
+        return entry[1]
+
+    def _raw_create(self, client):
+        """create() that also exposes response headers, when the client supports it"""
+        completions = self._without_retries(client).chat.completions
+        raw = getattr(completions, "with_raw_response", None)
+        return (raw.create, True) if raw is not None else (completions.create, False)
+
+    def call(self, client, **kwargs):
+        """Run client.chat.completions.create(**kwargs) under the schedule"""
+        create, raw = self._raw_create(client)
+        started = time.perf_counter()
+        with self._cond:
+            while self.active >= int(self.limit):
+                self._cond.wait()
+            self.active += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                estimate, wait = self._admit(kwargs)
+                if wait:
+                    time.sleep(wait)
+                try:
+                    response = create(**kwargs)
+                except Exception as e:
+                    self.tokens.refund(estimate)
+                    if not _is_retryable(e) or attempt == self.max_retries:
+                        self.totals["failed"] += 1
+                        raise
+                    if _status(e) == 429:
+                        self._on_rate_limited()
+                    self.totals["retries"] += 1
+                    time.sleep(self._backoff(attempt, e))
+                    continue
+                headers = response.headers if raw else None
+                parsed = response.parse() if raw else response
+                self._on_success(headers)
+                self._record(estimate, parsed, attempt + 1, started)
+                return parsed
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+    async def acall(self, client, **kwargs):
+        """Async variant of call() for AsyncOpenAI clients"""
+        import asyncio
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        create, raw = self._raw_create(client)
+        started = time.perf_counter()
+        async with self._async_cond:
+            await self._async_cond.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                estimate, wait = self._admit(kwargs)
+                if wait:
+                    await asyncio.sleep(wait)
+                try:
+                    response = await create(**kwargs)
+                except Exception as e:
+                    self.tokens.refund(estimate)
+                    if not _is_retryable(e) or attempt == self.max_retries:
+                        self.totals["failed"] += 1
+                        raise
+                    if _status(e) == 429:
+                        self._on_rate_limited()
+                    self.totals["retries"] += 1
+                    await asyncio.sleep(self._backoff(attempt, e))
+                    continue
+                headers = response.headers if raw else None
+                parsed = response.parse() if raw else response
+                self._on_success(headers)
+                self._record(estimate, parsed, attempt + 1, started)
+                return parsed
+        finally:
+            async with self._async_cond:
+                self.active -= 1
+                self._async_cond.notify_all()
+
+    def stats(self) -> dict:
+        return {**self.totals, "concurrency_limit": int(self.limit), "active": self.active}
@@ -0,0 +1,283 @@
+"""
+Webhook service - accepts reply webhooks, queues them and replies via callback
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+import httpx
+
+from autoresponder import CLASSIFIER_MODES, AsyncAutoresponder, Autoresponder
+from deadline import Hedger
+from metrics import Metrics
+from output_rules import OutputValidator
+from priority import PriorityDispatcher
+from httpio import PayloadTooLarge, json_response, read_request, text_response
+from reply_pool import ReplyPool
+from reply_text import EmailPreprocessor
+from scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+# Field names used for the reply text and id by the sending tools we integrate with
+MESSAGE_FIELDS = ("message", "reply_text", "reply", "text", "body", "email_body")
+ID_FIELDS = ("id", "reply_id", "message_id", "email_id")
+RECIPIENT_FIELDS = ("recipient", "lead_email", "email", "from_email", "from")
+
+
+def extract_job(payload: dict, default_callback: str = None) -> dict:
+    """Pull the reply text, id and callback URL out of a webhook payload"""
+    message = next((payload[f] for f in MESSAGE_FIELDS if isinstance(payload.get(f), str)), None)
+    if not message or not message.strip():
+        raise ValueError(f"Payload has no reply text (expected one of {', '.join(MESSAGE_FIELDS)})")
+    job_id = next((str(payload[f]) for f in ID_FIELDS if payload.get(f) is not None), None)
+    recipient = next((payload[f] for f in RECIPIENT_FIELDS if isinstance(payload.get(f), str)), None)
+    return {
+        "id": job_id or uuid.uuid4().hex,
+        "message": message,
+        "recipient": recipient,
+        "callback_url": payload.get("callback_url") or default_callback,
+        "payload": payload,
+    }
+
+
+class WebhookServer:
+    """Acknowledges webhooks with 202 and drains a bounded queue with a fixed worker pool"""
+
+    def __init__(
+        self,
+        responder: AsyncAutoresponder,
+        workers: int = 8,
+        queue_size: int = 1000,
+        callback_url: str = None,
+        retry_after: int = 5,
+        callback_attempts: int = 3,
+        priority: bool = False,
+        slas: dict = None,
+    ):
+        self.responder = responder
+        self.workers = workers
+        self.queue_size = queue_size
+        self.callback_url = callback_url
+        self.retry_after = retry_after
+        self.callback_attempts = callback_attempts
+        self.dispatcher = PriorityDispatcher(responder, self._complete, workers, slas) if priority else None
+        if self.dispatcher is not None and responder.metrics is not None:
+            responder.metrics.add_source("sla", self.dispatcher.stats)
+
+        self.queue = None
+        self.stats = {"accepted": 0, "rejected": 0, "processed": 0, "failed": 0, "delivered": 0}
+        self._server = None
+        self._tasks = []
+        self._http = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        """Bind the listener and start the workers; returns the bound port"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._http = httpx.AsyncClient(timeout=10.0)
+        if self.dispatcher is not None:
+            self.dispatcher.start()
+        else:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self, drain: bool = True):
+        """Stop accepting webhooks, optionally finish queued jobs, then shut down"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if drain:
+            await self.queue.join()
+            if self.dispatcher is not None:
+                await self.dispatcher.join()
+        if self.dispatcher is not None:
+            await self.dispatcher.stop()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._http.aclose()
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8080):
+        port = await self.start(host, port)
+        logger.info("Listening on %s:%s with %s workers", host, port, self.workers)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop(drain=False)
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        headers = {}
+        try:
+            request = await read_request(reader)
+            if request is None:
+                writer.close()
+                return
+            method, path, _, raw = request
+            if path == "/metrics" and self.responder.metrics is not None:
+                writer.write(text_response(200, self.responder.metrics.prometheus(), "text/plain; version=0.0.4"))
+                await writer.drain()
+                writer.close()
+                return
+            status, body, headers = self._route(method, path, raw)
+        except PayloadTooLarge:
+            status, body = 413, {"error": "payload too large"}
+        except (ValueError, asyncio.IncompleteReadError):
+            status, body = 400, {"error": "malformed request"}
+
+        writer.write(json_response(status, body, headers))
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def _route(self, method: str, path: str, raw: bytes) -> tuple:
+        """Return (status, body, extra headers)"""
+        if path == "/health":
+            health = {"status": "ok", "queued": self._queued(), **self.stats}
+            if self.dispatcher is not None:
+                health["sla"] = self.dispatcher.stats()
+            return 200, health, {}
+        if path != "/webhook" and not path.startswith("/webhook/"):
+            return 404, {"error": "not found"}, {}
+        if method != "POST":
+            return 405, {"error": "method not allowed"}, {"Allow": "POST"}
+
+        try:
+            payload = json.loads(raw or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Payload must be a JSON object")
+            job = extract_job(payload, self.callback_url)
+        except ValueError as e:
+            return 400, {"error": str(e)}, {}
+
+        try:
+            if self.dispatcher is None:
+                self.queue.put_nowait(job)
+            elif self.dispatcher.queued() >= self.queue_size:
+                raise asyncio.QueueFull
+            else:
+                self.dispatcher.submit(job)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return 429, {"error": "queue full"}, {"Retry-After": str(self.retry_after)}
+
+        self.stats["accepted"] += 1
+        return 202, {"id": job["id"], "queued": self._queued()}, {}
+
+    def _queued(self) -> int:
+        return self.queue.qsize() if self.dispatcher is None else self.dispatcher.queued()
+
+    # Workers
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            except Exception:
+                logger.exception("Job %s crashed", job["id"])
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: dict):
+        try:
+            result = await self.responder.process(job["message"], recipient=job.get("recipient"))
+        except Exception as e:
+            logger.warning("Job %s failed: %s", job["id"], e)
+            result = {"error": str(e)}
+        await self._complete(job, result)
+
+    async def _complete(self, job: dict, result: dict):
+        result = {"id": job["id"], **result}
+        self.stats["failed" if "error" in result else "processed"] += 1
+        if job["callback_url"]:
+            await self._deliver(job["callback_url"], result)
+
+    async def _deliver(self, url: str, result: dict):
+        """POST the result to the callback URL, retrying with backoff"""
+        for attempt in range(self.callback_attempts):
+            try:
+                response = await self._http.post(url, json=result)
+                if response.is_success:
+                    self.stats["delivered"] += 1
+                    return
+                logger.warning("Callback to %s returned %s", url, response.status_code)
+            except httpx.HTTPError as e:
+                logger.warning("Callback to %s failed: %s", url, e)
+            if attempt + 1 < self.callback_attempts:
+                await asyncio.sleep(2 ** attempt)
+        logger.error("Giving up on callback for %s", result["id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autoresponder webhook service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8, help="concurrent pipeline workers")
+    parser.add_argument("--queue-size", type=int, default=1000, help="jobs held before returning 429")
+    parser.add_argument("--callback-url", help="default URL results are POSTed to")
+    parser.add_argument("--calendar-link", default="https://cal.com/your-calendar")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint, e.g. a local mock")
+    parser.add_argument("--classifier-mode", default="json", choices=CLASSIFIER_MODES)
+    parser.add_argument("--classify-model", help="cheap model tried before escalating to the strong one")
+    parser.add_argument("--strip-quotes", action="store_true",
+                        help="reduce full email bodies to the new reply before classifying")
+    parser.add_argument("--deadline", type=float, help="latency budget per reply before a template is sent")
+    parser.add_argument("--hedge", type=float, help="hedge calls slower than this latency percentile, e.g. 95")
+    parser.add_argument("--reply-pool", help="pregenerated reply pool database, refilled in the background")
+    parser.add_argument("--priority", action="store_true",
+                        help="classify first and generate hot leads ahead of the backlog, by per-category SLA")
+    parser.add_argument("--validate", action="store_true",
+                        help="check replies against the prompt rules and regenerate ones that break them")
+    parser.add_argument("--retry-budget", type=float, default=0.25, help="regenerations allowed per checked reply")
+    parser.add_argument("--rpm", type=int, default=500, help="requests per minute allowed by the provider")
+    parser.add_argument("--tpm", type=int, default=30000, help="tokens per minute allowed by the provider")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    pool = ReplyPool(args.reply_pool) if args.reply_pool else None
+    if pool is not None:
+        pool.start_refill(Autoresponder(
+            api_key=os.environ.get("OPENAI_API_KEY", ""),
+            calendar_link=args.calendar_link,
+            base_url=args.base_url,
+        ))
+    responder = AsyncAutoresponder(
+        api_key=os.environ.get("OPENAI_API_KEY", ""),
+        calendar_link=args.calendar_link,
+        classifier_mode=args.classifier_mode,
+        classify_model=args.classify_model,
+        base_url=args.base_url,
+        scheduler=Scheduler(rpm=args.rpm, tpm=args.tpm, max_concurrency=args.workers),
+        metrics=Metrics(),
+        preprocessor=EmailPreprocessor() if args.strip_quotes else None,
+        deadline=args.deadline,
+        hedger=Hedger(percentile=args.hedge) if args.hedge else None,
+        reply_pool=pool,
+        validator=OutputValidator(budget=args.retry_budget) if args.validate else None,
+        max_concurrency=args.workers,
+    )
+    server = WebhookServer(
+        responder,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        callback_url=args.callback_url,
+        priority=args.priority,
+    )
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
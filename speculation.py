@@ -0,0 +1,62 @@
+"""
+Speculation - guess the category early so generation can overlap classification
+"""
+import threading
+from collections import Counter, deque
+
+
+class Speculator:
+    """Predicts the likely category from a local hint, else from recent category frequencies"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, min_share: float = 0.5, hint=None):
+        self.hint = hint
+        self.min_samples = min_samples
+        self.min_share = min_share
+        self._recent = deque(maxlen=window)
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0
+
+    def guess(self, message: str):
+        """Category worth generating for before classification finishes, or None"""
+        if self.hint is not None:
+            category = self.hint(message)
+            if category is not None:
+                return category
+        with self._lock:
+            if len(self._recent) < self.min_samples:
+                return None
+            category, count = self._counts.most_common(1)[0]
+            if count / len(self._recent) < self.min_share:
+                return None
+            return category
+
+    def record(self, category: str):
+        """Feed back the category classification settled on"""
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                self._counts[self._recent[0]] -= 1
+            self._recent.append(category)
+            self._counts[category] += 1
+
+    def hit(self, saved: float):
+        with self._lock:
+            self.hits += 1
+            self.saved += saved
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        attempts = self.hits + self.misses
+        return {
+            "attempts": attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / attempts if attempts else 0.0,
+            "saved_seconds": self.saved,
+            "saved_per_attempt": self.saved / attempts if attempts else 0.0,
+        }
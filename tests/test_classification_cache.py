@@ -0,0 +1,58 @@
+"""
+Parse failures must not be cached: the fallback goes to manual review and the next call retries
+"""
+import asyncio
+from types import SimpleNamespace
+
+from autoresponder import AsyncAutoresponder, Autoresponder
+from cache import ResponseCache
+
+
+def _completion(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+class StubClient:
+    def __init__(self, content: str):
+        self.content = content
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return _completion(self.content)
+
+
+class AsyncStubClient(StubClient):
+    async def create(self, **kwargs):
+        self.calls += 1
+        return _completion(self.content)
+
+
+def test_parse_failure_is_not_cached():
+    client = StubClient("not json")
+    responder = Autoresponder("test", client=client, cache=ResponseCache())
+    first = responder.classify("Can you say more about this?")
+    second = responder.classify("Can you say more about this?")
+    assert client.calls == 2
+    assert first["manual_required"] and second["tier"] != "cache"
+
+
+def test_parse_failure_is_not_cached_async():
+    client = AsyncStubClient("not json")
+    responder = AsyncAutoresponder("test", client=client, cache=ResponseCache())
+
+    async def run():
+        await responder.classify("Can you say more about this?")
+        return await responder.classify("Can you say more about this?")
+
+    assert asyncio.run(run())["tier"] != "cache"
+    assert client.calls == 2
+
+
+def test_parsed_classification_is_cached():
+    client = StubClient('{"category": "SOFT_POSITIVE", "confidence": "high", "manual_required": false}')
+    responder = Autoresponder("test", client=client, cache=ResponseCache())
+    responder.classify("Can you say more about this?")
+    assert responder.classify("Can you say more about this?")["tier"] == "cache"
+    assert client.calls == 1
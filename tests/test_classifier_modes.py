@@ -0,0 +1,34 @@
+"""
+Code mode asks only for the sampled tokens' logprobs and reads confidence from the category token
+"""
+import math
+from types import SimpleNamespace
+
+from autoresponder import Autoresponder
+
+
+class CodeClient:
+    def __init__(self, probability: float):
+        self.probability = probability
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        tokens = [SimpleNamespace(token="A", logprob=math.log(self.probability)),
+                  SimpleNamespace(token=" 0", logprob=-0.001)]
+        choice = SimpleNamespace(message=SimpleNamespace(content="A 0"), logprobs=SimpleNamespace(content=tokens))
+        return SimpleNamespace(choices=[choice], usage=None)
+
+
+def test_code_mode_requests_only_sampled_logprobs():
+    client = CodeClient(0.95)
+    Autoresponder("test", client=client, classifier_mode="code").classify("Could you say more about pricing?")
+    assert client.requests[0]["logprobs"] is True
+    assert "top_logprobs" not in client.requests[0]
+
+
+def test_code_mode_confidence_follows_category_logprob():
+    for probability, confidence in ((0.95, "high"), (0.7, "medium"), (0.3, "low")):
+        responder = Autoresponder("test", client=CodeClient(probability), classifier_mode="code")
+        assert responder.classify("Could you say more about pricing?")["confidence"] == confidence
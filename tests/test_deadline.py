@@ -0,0 +1,78 @@
+"""
+A deadline hit after classification keeps the category, so the right template is sent;
+hedge thresholds track the first attempt, not whichever call won
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from autoresponder import AsyncAutoresponder, Autoresponder
+from deadline import Hedger
+from speculation import Speculator
+
+CLASSIFICATION = '{"category": "STRONG_POSITIVE", "confidence": "high", "manual_required": false}'
+MESSAGE = "Yes, I'd be keen on a call this month."
+
+
+def _completion(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+class SlowGenerationClient:
+    """Classifies at once; generation outlasts any test deadline"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        if kwargs.get("response_format") is None and "json" not in str(kwargs["messages"][0]).lower():
+            time.sleep(1.0)
+            raise TimeoutError("generation too slow")
+        return _completion(CLASSIFICATION)
+
+
+class AsyncSlowGenerationClient(SlowGenerationClient):
+    async def create(self, **kwargs):
+        if kwargs.get("response_format") is None and "json" not in str(kwargs["messages"][0]).lower():
+            await asyncio.sleep(1.0)
+            raise TimeoutError("generation too slow")
+        return _completion(CLASSIFICATION)
+
+
+def test_speculative_deadline_keeps_classification():
+    responder = Autoresponder("test", client=SlowGenerationClient(), speculator=Speculator())
+    result = responder.process(MESSAGE, deadline=0.3)
+    assert result["category"] == "STRONG_POSITIVE"
+    assert result["response"] == responder.templates["STRONG_POSITIVE"]
+    assert result["manual_required"]
+
+
+def test_speculative_deadline_keeps_classification_async():
+    responder = AsyncAutoresponder("test", client=AsyncSlowGenerationClient(), speculator=Speculator())
+    result = asyncio.run(responder.process(MESSAGE, deadline=0.3))
+    assert result["category"] == "STRONG_POSITIVE"
+    assert result["response"] == responder.templates["STRONG_POSITIVE"]
+
+
+class StragglerClient:
+    """The first generation call stalls; any duplicate answers at once"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            time.sleep(0.5)
+        return _completion("Happy to set up a call.")
+
+
+def test_hedge_win_records_the_slow_attempt():
+    hedger = Hedger(percentile=50, min_samples=1, max_rate=1.0)
+    hedger.record("generate", 0.1)
+    responder = Autoresponder("test", client=StragglerClient(), hedger=hedger)
+    responder.generate_response(MESSAGE, "STRONG_POSITIVE")
+    assert hedger.hedge_wins == 1
+    # The straggler had run past the threshold when the hedge won, so the threshold can't shrink
+    assert hedger.quantile("generate", 0) >= 0.1
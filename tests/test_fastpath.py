@@ -0,0 +1,24 @@
+from fastpath import FastPathClassifier
+
+
+def test_opt_out_anywhere():
+    assert FastPathClassifier().match("Thanks, but please remove me from this list.") == "HARD_NO"
+
+
+def test_negated_or_interested_opt_out_defers_to_llm():
+    fast_path = FastPathClassifier()
+    assert fast_path.match("Sounds good - and please don't remove me from the list, I want the intro.") is None
+    assert fast_path.match("Yes let's talk. How do I unsubscribe my old address and use this one?") is None
+
+
+def test_opt_out_with_more_to_say_defers_to_llm():
+    fast_path = FastPathClassifier()
+    assert fast_path.match("remove me from the CC and add my colleague") is None
+    assert fast_path.match("Can you remove me from this thread and email my partner instead?") is None
+    assert fast_path.match("I'm not going to unsubscribe, tell me more") is None
+
+
+def test_standalone_opt_outs_stay_local():
+    fast_path = FastPathClassifier()
+    assert fast_path.match("Not interested, remove me.") == "HARD_NO"
+    assert fast_path.match("Please remove me from all of your marketing lists going forward") == "HARD_NO"
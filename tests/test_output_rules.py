@@ -0,0 +1,17 @@
+import pytest
+
+from output_rules import OutputValidator
+from prompts import FALLBACK_TEMPLATES
+
+LINK = "https://cal.com/acme"
+
+
+@pytest.mark.parametrize("category", sorted(FALLBACK_TEMPLATES))
+def test_fallback_templates_follow_prompt_rules(category):
+    template = FALLBACK_TEMPLATES[category].format(calendar_link=LINK)
+    assert OutputValidator().check(category, template, LINK) == []
+
+
+def test_greeting_and_banned_words_are_flagged():
+    violations = OutputValidator().check("NEUTRAL", "Hi Sam! Happy to help.", LINK)
+    assert {v.rule for v in violations} == {"greeting", "banned_words"}
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from autoresponder import AsyncAutoresponder
+from priority import PriorityDispatcher
+from speculation import Speculator
+
+CLASSIFICATION = '{"category": "SOFT_POSITIVE", "confidence": "high", "manual_required": false}'
+
+
+class SlowGenerationClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        if kwargs.get("max_tokens") == 150:
+            await asyncio.sleep(1.0)
+            content = "generated reply"
+        else:
+            content = CLASSIFICATION
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def test_deadline_applies_to_dispatched_jobs():
+    responder = AsyncAutoresponder("test", client=SlowGenerationClient(), deadline=0.2)
+    results = []
+
+    async def run():
+        async def done(job, result):
+            results.append((time.monotonic() - started, result))
+
+        dispatcher = PriorityDispatcher(responder, done, workers=2)
+        dispatcher.start()
+        started = time.monotonic()
+        dispatcher.submit({"id": "1", "message": "Interesting, tell me more."})
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    asyncio.run(run())
+    (elapsed, result), = results
+    assert elapsed < 0.5
+    assert result["fallback"] == "deadline" and result["category"] == "SOFT_POSITIVE"
+
+
+def test_speculative_responder_is_rejected():
+    responder = AsyncAutoresponder("test", client=SlowGenerationClient(), speculator=Speculator())
+    with pytest.raises(ValueError):
+        PriorityDispatcher(responder, None)
@@ -0,0 +1,61 @@
+"""
+Pooled replies are served in every mode, not only two-stage
+"""
+import asyncio
+from types import SimpleNamespace
+
+from autoresponder import AsyncAutoresponder, Autoresponder
+from fastpath import FastPathClassifier
+from reply_pool import ReplyPool
+from speculation import Speculator
+
+CLASSIFICATION = '{"category": "NEUTRAL", "confidence": "high", "manual_required": false}'
+MESSAGE = "Who is this?"
+
+
+def _completion(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+class Client:
+    def __init__(self):
+        self.generated = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        if kwargs.get("max_tokens") == 150:
+            self.generated += 1
+            return _completion("generated reply")
+        return _completion(CLASSIFICATION)
+
+
+class AsyncClient(Client):
+    async def create(self, **kwargs):
+        return Client.create(self, **kwargs)
+
+
+def _pool(responder) -> ReplyPool:
+    pool = ReplyPool(":memory:")
+    pool.add(responder.tenant, responder.registry.fingerprint(responder.tenant), "NEUTRAL", "pooled reply")
+    pool.add(responder.tenant, responder.registry.fingerprint(responder.tenant), "STRONG_POSITIVE", "pooled reply")
+    return pool
+
+
+def test_speculative_path_serves_pool():
+    responder = Autoresponder("test", client=Client(), speculator=Speculator(hint=lambda message: "NEUTRAL"))
+    responder.reply_pool = _pool(responder)
+    assert responder.process(MESSAGE)["response"] == "pooled reply"
+
+
+def test_speculative_path_serves_pool_async():
+    responder = AsyncAutoresponder("test", client=AsyncClient(), speculator=Speculator(hint=lambda message: "NEUTRAL"))
+    responder.reply_pool = _pool(responder)
+    assert asyncio.run(responder.process(MESSAGE))["response"] == "pooled reply"
+
+
+def test_fused_path_serves_pool_for_local_classifications():
+    client = Client()
+    responder = Autoresponder("test", client=client, mode="fused", fast_path=FastPathClassifier())
+    responder.reply_pool = _pool(responder)
+    assert responder.process("sounds good")["response"] == "pooled reply"
+    assert client.generated == 0
@@ -0,0 +1,22 @@
+from reply_text import strip_reply
+
+
+def test_sign_off_block_is_dropped():
+    body = "Sure, let's talk.\n\nBest,\nSam Lee\nVP Sales, Acme Inc.\n+1 (555) 123-4567"
+    assert strip_reply(body).text == "Sure, let's talk."
+
+
+def test_valediction_mid_reply_keeps_what_follows():
+    body = "Sure.\nThanks\nWhat's the pricing and who else uses it?"
+    assert strip_reply(body).text == body
+
+
+def test_body_starting_with_this_email_is_kept():
+    body = "Thanks for reaching out.\nThis email is the third one this week - remove me."
+    assert strip_reply(body).text == body
+
+
+def test_confidentiality_disclaimer_is_dropped():
+    body = ("Sounds good, send it over.\n\nThis email and any attachments are confidential and intended "
+            "solely for the addressee.")
+    assert strip_reply(body).text == "Sounds good, send it over."
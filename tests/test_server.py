@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+
+from autoresponder import AsyncAutoresponder
+from server import WebhookServer
+
+
+def deliver(monkeypatch, statuses: list, attempts: int = 3):
+    webhook = WebhookServer(AsyncAutoresponder("test"), callback_attempts=attempts)
+    calls, sleeps = [], []
+
+    def respond(request):
+        calls.append(request)
+        return httpx.Response(statuses[len(calls) - 1])
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    async def run():
+        webhook._http = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        monkeypatch.setattr("server.asyncio.sleep", sleep)
+        try:
+            await webhook._deliver("http://crm.test/hook", {"id": "1"})
+        finally:
+            monkeypatch.undo()
+            await webhook._http.aclose()
+
+    asyncio.run(run())
+    return webhook.stats["delivered"], len(calls), sleeps
+
+
+def test_client_errors_are_not_counted_as_delivered(monkeypatch):
+    assert deliver(monkeypatch, [404, 404, 404]) == (0, 3, [1, 2])
+
+
+def test_delivery_stops_at_first_success(monkeypatch):
+    assert deliver(monkeypatch, [503, 200]) == (1, 2, [1])
@@ -0,0 +1,175 @@
+"""
+Thread store - per-thread conversation state, rendered into a token-bounded context window
+"""
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from scheduler import CHARS_PER_TOKEN, MESSAGE_OVERHEAD
+
+LABELS = {"lead": "Lead", "me": "Me"}
+
+# Accepted spellings for who wrote a turn
+ROLES = {"lead": "lead", "user": "lead", "me": "me", "us": "me", "assistant": "me"}
+
+
+def estimate(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD
+
+
+def clip(text: str, chars: int) -> str:
+    """Collapse whitespace and cut to `chars`, marking the cut"""
+    text = " ".join(text.split())
+    return text if len(text) <= chars else text[:chars - 3].rstrip() + "..."
+
+
+def as_turn(turn) -> tuple:
+    """(role, content) from a tuple or an OpenAI-style message dict"""
+    if isinstance(turn, dict):
+        role, content = turn["role"], turn["content"]
+    else:
+        role, content = turn
+    try:
+        return ROLES[role], content
+    except KeyError:
+        raise ValueError(f"Unknown turn role {role!r}, expected one of {sorted(ROLES)}") from None
+
+
+class ThreadStore:
+    """Keeps the last `keep_turns` turns per thread verbatim and folds older ones into a short digest
+
+    The context window for a thread never exceeds `budget` tokens, however long
+    the thread gets: the opening message and recent turns go in whole, older
+    ones clipped, and the oldest are dropped once the budget is spent.
+    """
+
+    def __init__(self, budget: int = 400, keep_turns: int = 12, compact_chars: int = 160,
+                 digest_chars: int = 600, max_threads: int = 10000, path: str = None):
+        self.budget = budget
+        self.keep_turns = keep_turns
+        self.compact_chars = compact_chars
+        self.digest_chars = digest_chars
+        self.max_threads = max_threads
+        self.compacted = 0
+        self.clipped = 0
+
+        self._threads = OrderedDict()  # thread id -> [opener line, digest lines, turns]
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS threads (id TEXT PRIMARY KEY, state TEXT NOT NULL)")
+            self._db.commit()
+
+    def _load(self, thread_id: str):
+        state = self._threads.get(thread_id)
+        if state is not None:
+            self._threads.move_to_end(thread_id)
+            return state
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT state FROM threads WHERE id = ?", (thread_id,)).fetchone()
+        if row is None:
+            return None
+        opener, digest, turns = json.loads(row[0])
+        state = [opener, digest, [tuple(t) for t in turns]]
+        self._remember(thread_id, state)
+        return state
+
+    def _remember(self, thread_id: str, state: list):
+        self._threads[thread_id] = state
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+    def __contains__(self, thread_id: str) -> bool:
+        with self._lock:
+            return self._load(thread_id) is not None
+
+    def extend(self, thread_id: str, turns: list):
+        """Append turns, folding the oldest into the digest past keep_turns"""
+        new = [as_turn(t) for t in turns]
+        with self._lock:
+            state = self._load(thread_id)
+            if state is None:
+                if not new:
+                    return
+                role, content = new.pop(0)
+                state = [f"{LABELS[role]}: {clip(content, self.digest_chars)}", [], []]
+                self._remember(thread_id, state)
+            opener, digest, kept = state
+            kept.extend(new)
+            while len(kept) > self.keep_turns:
+                role, content = kept.pop(0)
+                digest.append(f"{LABELS[role]}: {clip(content, self.compact_chars)}")
+                self.compacted += 1
+            while digest and sum(len(line) for line in digest) > self.digest_chars:
+                digest.pop(0)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO threads (id, state) VALUES (?, ?)",
+                    (thread_id, json.dumps(state)),
+                )
+                self._db.commit()
+
+    def turns(self, thread_id: str) -> list:
+        """Verbatim turns held for the thread after its opening message"""
+        with self._lock:
+            state = self._load(thread_id)
+            return list(state[2]) if state else []
+
+    def context(self, thread_id: str, budget: int = None) -> str:
+        """Earlier turns as text, oldest first, within `budget` tokens; empty for a new thread"""
+        budget = self.budget if budget is None else budget
+        with self._lock:
+            state = self._load(thread_id)
+            if state is None:
+                return ""
+            opener, digest, turns = state[0], list(state[1]), list(state[2])
+
+        # The opening message, usually our outreach, goes first whenever it fits
+        used = estimate(opener)
+        if used > budget:
+            opener, used = None, 0
+
+        lines, clipping = [], False
+        for role, content in reversed(turns):
+            line = f"{LABELS[role]}: {content.strip()}"
+            if clipping or used + estimate(line) > budget:
+                line = f"{LABELS[role]}: {clip(content, self.compact_chars)}"
+                clipping = True
+            if used + estimate(line) > budget:
+                break
+            lines.append(line)
+            used += estimate(line)
+        if clipping:
+            self.clipped += 1
+
+        earlier = []
+        if len(lines) == len(turns):
+            for line in reversed(digest):
+                if used + estimate(line) > budget:
+                    break
+                earlier.insert(0, line)
+                used += estimate(line)
+        omitted = len(turns) - len(lines) + len(digest) - len(earlier)
+        if omitted:
+            earlier.insert(0, f"[{omitted} earlier messages omitted]")
+        return "\n".join(([opener] if opener else []) + earlier + lines[::-1])
+
+    def forget(self, thread_id: str):
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM threads WHERE id = ?", (thread_id,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "threads": len(self._threads),
+            "compacted_turns": self.compacted,
+            "clipped_windows": self.clipped,
+            "budget": self.budget,
+        }
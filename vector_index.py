@@ -0,0 +1,278 @@
+"""
+Vector index classifier - nearest neighbours over labeled reply history, CPU only
+"""
+import argparse
+import json
+import os
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from fastpath import CATEGORIES, normalize
+
+DEFAULT_DIM = 512
+
+
+def _features(text: str) -> list:
+    """Word unigrams/bigrams plus character 3-5 grams"""
+    words = text.split()
+    features = [f"w:{w}" for w in words]
+    features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {text} "
+    for n in (3, 4, 5):
+        features += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+    return features
+
+
+def hash_counts(message: str, dim: int) -> np.ndarray:
+    """Signed feature hashing with a process-stable hash"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in _features(normalize(message)):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    return vector
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def read_jsonl(path: str):
+    """Yield (message, category, manual_required) from a labeled JSONL file"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            message = row.get("message") or row.get("text") or ""
+            category = row.get("category")
+            if message and category in CATEGORIES:
+                yield message, category, bool(row.get("manual_required", False))
+
+
+class VectorIndex:
+    """TF-IDF weighted hashed n-gram vectors with a k-nearest-neighbour vote
+
+    classify() answers when the best match is similar enough and the
+    neighbours agree, and returns None to defer to the LLM otherwise.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM, threshold: float = 0.8, k: int = 5, min_agreement: float = 0.8):
+        self.dim = dim
+        self.threshold = threshold
+        self.k = k
+        self.min_agreement = min_agreement
+
+        self.idf = np.ones(dim, dtype=np.float32)
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int8)
+        self.manual = np.zeros(0, dtype=bool)
+        self._pending = []  # (vector, label, manual) added since load/build
+
+        self.hits = 0
+        self.misses = 0
+
+    # Building
+
+    @classmethod
+    def build(cls, examples, **kwargs) -> "VectorIndex":
+        """Build from (message, category, manual_required) tuples"""
+        index = cls(**kwargs)
+        counts, labels, manual = [], [], []
+        for message, category, flag in examples:
+            counts.append(hash_counts(message, index.dim))
+            labels.append(CATEGORIES.index(category))
+            manual.append(flag)
+        if not counts:
+            return index
+
+        counts = np.stack(counts)
+        df = (counts != 0).sum(axis=0)
+        index.idf = (np.log((1 + len(counts)) / (1 + df)) + 1).astype(np.float32)
+        index.vectors = _unit(counts * index.idf)
+        index.labels = np.array(labels, dtype=np.int8)
+        index.manual = np.array(manual, dtype=bool)
+        return index
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> "VectorIndex":
+        return cls.build(read_jsonl(path), **kwargs)
+
+    def _embed(self, message: str) -> np.ndarray:
+        return _unit(hash_counts(message, self.dim) * self.idf)
+
+    def add(self, message: str, category: str, manual_required: bool = False):
+        """Add one labeled reply; it is searchable immediately and written on save()"""
+        self._pending.append((self._embed(message), CATEGORIES.index(category), manual_required))
+
+    def __len__(self) -> int:
+        return len(self.labels) + len(self._pending)
+
+    # Persistence
+
+    def save(self, path: str):
+        """Write the index directory, folding in pending additions"""
+        os.makedirs(path, exist_ok=True)
+        if self._pending:
+            vectors, labels, manual = zip(*self._pending)
+            self.vectors = np.concatenate([np.asarray(self.vectors), np.stack(vectors)])
+            self.labels = np.concatenate([np.asarray(self.labels), np.array(labels, dtype=np.int8)])
+            self.manual = np.concatenate([np.asarray(self.manual), np.array(manual, dtype=bool)])
+            self._pending = []
+
+        for name, array in (("vectors", self.vectors), ("labels", self.labels),
+                            ("manual", self.manual), ("idf", self.idf)):
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": int(len(self.labels)), "categories": list(CATEGORIES)}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, **kwargs) -> "VectorIndex":
+        """Open a saved index; vectors are memory-mapped unless mmap=False"""
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(dim=meta["dim"], **kwargs)
+        mode = "r" if mmap else None
+        index.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        index.labels = np.load(os.path.join(path, "labels.npy"))
+        index.manual = np.load(os.path.join(path, "manual.npy"))
+        index.idf = np.load(os.path.join(path, "idf.npy"))
+        return index
+
+    # Querying
+
+    def neighbours(self, message: str) -> list:
+        """Top-k (similarity, category index, manual) matches"""
+        query = self._embed(message)
+        scores = np.asarray(self.vectors) @ query if len(self.labels) else np.zeros(0, dtype=np.float32)
+        labels, manual = self.labels, self.manual
+        if self._pending:
+            vectors, extra_labels, extra_manual = zip(*self._pending)
+            scores = np.concatenate([scores, np.stack(vectors) @ query])
+            labels = np.concatenate([labels, np.array(extra_labels, dtype=np.int8)])
+            manual = np.concatenate([manual, np.array(extra_manual, dtype=bool)])
+        if not len(scores):
+            return []
+        k = min(self.k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(labels[i]), bool(manual[i])) for i in top]
+
+    def predict(self, message: str):
+        """Classification dict, or None when the neighbours aren't close or don't agree"""
+        matches = self.neighbours(message)
+        if not matches or matches[0][0] < self.threshold:
+            return None
+        close = [m for m in matches if m[0] >= self.threshold]
+        votes = Counter()
+        for score, label, _ in close:
+            votes[label] += score
+        label, weight = votes.most_common(1)[0]
+        if weight / sum(votes.values()) < self.min_agreement:
+            return None
+        manual = [flag for _, neighbour, flag in close if neighbour == label]
+        return {
+            "category": CATEGORIES[label],
+            "confidence": "high" if matches[0][0] >= (1 + self.threshold) / 2 else "medium",
+            "manual_required": sum(manual) * 2 > len(manual),
+        }
+
+    def guess(self, message: str):
+        """Category with the most neighbour weight, however distant; a hint for speculation"""
+        votes = Counter()
+        for score, label, _ in self.neighbours(message):
+            votes[label] += max(score, 0.0)
+        if not votes:
+            return None
+        return CATEGORIES[votes.most_common(1)[0][0]]
+
+    def classify(self, message: str):
+        """Same contract as FastPathClassifier.classify(), with hit counting"""
+        result = self.predict(message)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+    def evaluate(self, examples, thresholds: list = None) -> list:
+        """LLM calls avoided versus accuracy, for each similarity threshold"""
+        examples = list(examples)
+        original = self.threshold
+        rows = []
+        try:
+            for threshold in thresholds or [original]:
+                self.threshold = threshold
+                answered = correct = 0
+                for message, category, _ in examples:
+                    result = self.predict(message)
+                    if result is not None:
+                        answered += 1
+                        correct += result["category"] == category
+                rows.append({
+                    "threshold": threshold,
+                    "examples": len(examples),
+                    "llm_calls_avoided": answered,
+                    "coverage": answered / len(examples) if examples else 0.0,
+                    "accuracy": correct / answered if answered else None,
+                })
+        finally:
+            self.threshold = original
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and evaluate the local reply classifier index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="build an index from labeled JSONL")
+    build.add_argument("input", help="JSONL rows with message, category and optional manual_required")
+    build.add_argument("index", help="output directory")
+    build.add_argument("--dim", type=int, default=DEFAULT_DIM)
+
+    add = sub.add_parser("add", help="append labeled JSONL to an existing index")
+    add.add_argument("input")
+    add.add_argument("index")
+
+    report = sub.add_parser("report", help="coverage and accuracy on a held-out JSONL file")
+    report.add_argument("index")
+    report.add_argument("holdout")
+    report.add_argument("--thresholds", default="0.6,0.7,0.8,0.9")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        index = VectorIndex.from_jsonl(args.input, dim=args.dim)
+        index.save(args.index)
+        print(f"Indexed {len(index)} replies into {args.index}")
+    elif args.command == "add":
+        index = VectorIndex.load(args.index, mmap=False)
+        before = len(index)
+        for message, category, manual in read_jsonl(args.input):
+            index.add(message, category, manual)
+        index.save(args.index)
+        print(f"Added {len(index) - before} replies ({len(index)} total)")
+    else:
+        index = VectorIndex.load(args.index)
+        thresholds = [float(t) for t in args.thresholds.split(",")]
+        for row in index.evaluate(read_jsonl(args.holdout), thresholds):
+            accuracy = f"{row['accuracy']:.1%}" if row["accuracy"] is not None else "-"
+            print(f"threshold {row['threshold']:.2f}: {row['llm_calls_avoided']}/{row['examples']} "
+                  f"LLM calls avoided ({row['coverage']:.1%}), accuracy {accuracy}")
+
+
+if __name__ == "__main__":
+    main()